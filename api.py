@@ -0,0 +1,203 @@
+import json
+from datetime import datetime
+
+from flask import Blueprint, abort, current_app, request
+
+from models import db, Venue, Artist, Genre, Show, venue_genre, artist_genre
+from pagination import paginate
+
+try:
+    # optional: several times faster than json, with native datetimes
+    import orjson
+except ImportError:
+    orjson = None
+
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+# ----------------------------------------------------------------------------#
+# Serialization.
+# ----------------------------------------------------------------------------#
+
+def encode_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=encode_default, separators=(",", ":"))
+
+
+def json_response(data, status=200):
+    return current_app.response_class(dumps(data), status,
+                                      mimetype="application/json")
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return json_response({"error": error.description}, error.code)
+
+
+# ----------------------------------------------------------------------------#
+# Projection.
+# ----------------------------------------------------------------------------#
+
+# Each resource maps the field names accepted by ?fields= to the SQL
+# expression selecting them; only the requested ones are SELECTed, and
+# rows are serialized straight from the result tuples, without loading
+# any ORM entity. "genres" is resolved for the whole page in one query.
+
+VENUE_FIELDS = {
+    "id": lambda: Venue.id,
+    "name": lambda: Venue.name,
+    "city": lambda: Venue.city,
+    "state": lambda: Venue.state,
+    "address": lambda: Venue.address,
+    "phone": lambda: Venue.phone,
+    "image_link": lambda: Venue.image_link,
+    "facebook_link": lambda: Venue.facebook_link,
+    "website": lambda: Venue.website,
+    "seeking_talent": lambda: Venue.seeking_talent,
+    "seeking_description": lambda: Venue.seeking_description,
+    "num_upcoming_shows": lambda: Venue.upcoming_show_count,
+}
+VENUE_DEFAULT_FIELDS = ["id", "name", "city", "state"]
+
+ARTIST_FIELDS = {
+    "id": lambda: Artist.id,
+    "name": lambda: Artist.name,
+    "city": lambda: Artist.city,
+    "state": lambda: Artist.state,
+    "phone": lambda: Artist.phone,
+    "image_link": lambda: Artist.image_link,
+    "facebook_link": lambda: Artist.facebook_link,
+    "website": lambda: Artist.website,
+    "seeking_venue": lambda: Artist.seeking_venue,
+    "seeking_description": lambda: Artist.seeking_description,
+    "num_upcoming_shows": lambda: Artist.upcoming_show_count,
+}
+ARTIST_DEFAULT_FIELDS = ["id", "name", "city", "state"]
+
+SHOW_FIELDS = {
+    "id": lambda: Show.id,
+    "start_time": lambda: Show.start_time,
+    "duration": lambda: Show.duration,
+    "venue_id": lambda: Show.venue_id,
+    "artist_id": lambda: Show.artist_id,
+    "venue_name": lambda: Venue.name,
+    "artist_name": lambda: Artist.name,
+    "artist_image_link": lambda: Artist.image_link,
+}
+SHOW_DEFAULT_FIELDS = ["id", "start_time", "venue_id", "artist_id"]
+
+
+def requested_fields(available, default, extra=()):
+    """Field names of ?fields=, validated against available (and extra)."""
+    fields = request.args.get("fields")
+    names = [name.strip() for name in fields.split(",") if name.strip()] \
+        if fields else list(default)
+    unknown = [name for name in names
+               if name not in available and name not in extra]
+    if unknown:
+        abort(400, f"unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def project(available, names, keys):
+    """Columns for names, followed by the sort keys needed by the cursor
+    when they were not requested. Returns (columns, output names): zipping
+    a row with the output names drops the trailing keys."""
+    output = [name for name in names if name in available]
+    columns = [available[name]().label(name) for name in output]
+    columns += [available[key]().label(key) for key in keys
+                if key not in output]
+    return columns, output
+
+
+def attach_genres(items, ids, table, foreign_key):
+    """Add the list of genre names to the item dicts of the rows with ids,
+    in one query."""
+    genres = {id: [] for id in ids}
+    if ids:
+        rows = db.session.query(foreign_key, Genre.name)\
+            .join(Genre, Genre.id == table.c.genre_id)\
+            .filter(foreign_key.in_(ids))
+        for id, name in rows:
+            genres[id].append(name)
+    for item, id in zip(items, ids):
+        item["genres"] = genres[id]
+
+
+def listing(model, available, default, table, foreign_key, id=None):
+    """List (or, given id, fetch one of) the venues or artists."""
+    names = requested_fields(available, default, extra=["genres"])
+    # the id is always selected: it is the cursor, and genres need it
+    columns, output = project(available, names, ["id"])
+    query = db.session.query(*columns)
+    if id is not None:
+        row = query.filter(model.id == id).first()
+        if row is None:
+            abort(404, f"{model.__tablename__} {id} not found")
+        page = {"items": [row], "next": None, "prev": None}
+    else:
+        page = paginate(query, [model.id])
+
+    items = [dict(zip(output, row)) for row in page["items"]]
+    if "genres" in names:
+        attach_genres(items, [row.id for row in page["items"]], table,
+                      foreign_key)
+    if id is not None:
+        return json_response(items[0])
+    return json_response({"data": items, "next": page["next"],
+                          "prev": page["prev"]})
+
+
+# ----------------------------------------------------------------------------#
+# Endpoints.
+# ----------------------------------------------------------------------------#
+
+@api.route("/venues")
+def venues():
+    return listing(Venue, VENUE_FIELDS, VENUE_DEFAULT_FIELDS,
+                   venue_genre, venue_genre.c.venue_id)
+
+
+@api.route("/venues/<int:venue_id>")
+def venue(venue_id):
+    return listing(Venue, VENUE_FIELDS, VENUE_DEFAULT_FIELDS,
+                   venue_genre, venue_genre.c.venue_id, id=venue_id)
+
+
+@api.route("/artists")
+def artists():
+    return listing(Artist, ARTIST_FIELDS, ARTIST_DEFAULT_FIELDS,
+                   artist_genre, artist_genre.c.artist_id)
+
+
+@api.route("/artists/<int:artist_id>")
+def artist(artist_id):
+    return listing(Artist, ARTIST_FIELDS, ARTIST_DEFAULT_FIELDS,
+                   artist_genre, artist_genre.c.artist_id, id=artist_id)
+
+
+@api.route("/shows")
+def shows():
+    names = requested_fields(SHOW_FIELDS, SHOW_DEFAULT_FIELDS)
+    columns, output = project(SHOW_FIELDS, names, ["start_time", "id"])
+    query = db.session.query(*columns).select_from(Show)
+    # join only the tables the requested fields come from
+    if "venue_name" in names:
+        query = query.join(Venue, Show.venue_id == Venue.id)
+    if "artist_name" in names or "artist_image_link" in names:
+        query = query.join(Artist, Show.artist_id == Artist.id)
+    page = paginate(query, [Show.start_time, Show.id])
+    return json_response({
+        "data": [dict(zip(output, row)) for row in page["items"]],
+        "next": page["next"],
+        "prev": page["prev"],
+    })
@@ -0,0 +1,252 @@
+import re
+import sys
+from datetime import datetime
+
+from flask import Blueprint, render_template, request, flash, redirect, \
+    url_for, abort, current_app
+
+from cache import cached, cache_until
+from conditional import conditional, conditional_body
+from genres import resolve_genres
+from helpers import to_dict, split_shows
+from journal import accepted
+from models import db, Venue, Artist, Genre, Show, artist_genre
+from pagination import paginate
+from search import search_names
+
+
+artists = Blueprint("artists", __name__, url_prefix="/artists")
+
+
+#  ----------------------------------------------------------------
+#  Artists
+#  ----------------------------------------------------------------
+
+@artists.route('')
+@conditional_body
+@cached("artists")
+def listing():
+    # DONE: replace with real data returned from querying the database
+
+    page = paginate(Artist.query.with_entities(Artist.id, Artist.name),
+                    [Artist.id])
+    data = [{"id": x[0], "name": x[1]} for x in page["items"]]
+
+    return render_template('pages/artists.html', artists=data, page=page)
+
+
+@artists.route('/search', methods=['POST'])
+def search():
+    # DONE: implement search on artists with partial string search.
+    # Ensure it is case-insensitive.
+    # seach for "A" should return "Guns N Petals", "Matt Quevado", and
+    # "The Wild Sax Band".
+    # search for "band" should return "The Wild Sax Band".
+
+    search_term = request.form.get("search_term").strip()
+    # ranked ids of the best matches, then one lookup by primary key
+    artist_ids = search_names(Artist, search_term)
+    artists = Artist.query.with_entities(
+            Artist.id, Artist.name,
+            Artist.upcoming_show_count.label("num_upcoming_shows")
+        ).filter(Artist.id.in_(artist_ids)).all() if artist_ids else []
+    rank = {artist_id: i for i, artist_id in enumerate(artist_ids)}
+    artists.sort(key=lambda artist: rank[artist.id])
+
+    data = list()
+    for artist in artists:
+        artist_data = {
+            "id": artist.id,
+            "name": artist.name,
+            "num_upcoming_shows": artist.num_upcoming_shows
+        }
+        data.append(artist_data)
+    response = {
+        "count": len(artists),
+        "data": data
+    }
+
+    return render_template('pages/search_artists.html', results=response,
+                           search_term=request.form.get('search_term', ''))
+
+
+@artists.route('/<int:artist_id>')
+@conditional(Artist, Show.artist_id, "artist_id")
+@cached("artist:{artist_id}")
+def show(artist_id):
+    # shows the venue page with the given venue_id
+    # DONE: replace with real venue data from the venues table, using venue_id
+
+    # the artist and its genres in one query, its shows in a second one. The
+    # genre tables are outer joined one after the other: SQLite scans the
+    # whole (artist_genre JOIN genre) group joinedload would emit, instead of
+    # looking it up by artist_id.
+    artist = Artist.query\
+        .outerjoin(artist_genre, artist_genre.c.artist_id == Artist.id)\
+        .outerjoin(Genre, Genre.id == artist_genre.c.genre_id)\
+        .options(db.contains_eager(Artist.genre))\
+        .filter(Artist.id == artist_id).one_or_none()
+    if artist is None:
+        abort(404)
+
+    shows = db.session.query(
+            Show.start_time,
+            Venue.id.label("venue_id"),
+            Venue.name.label("venue_name"),
+            Venue.image_link.label("venue_image_link")
+        ).join(Venue, Show.venue_id == Venue.id)\
+        .filter(Show.artist_id == artist_id)\
+        .order_by(Show.start_time).all()
+
+    data = to_dict(artist)
+    # turn the list of Genre objects into a list of strings
+    data["genres"] = [genre.name for genre in artist.genre]
+    now = datetime.now()
+    data.update(split_shows(shows, now))
+    # the next upcoming show moves to the past shows when it starts
+    cache_until(next((show.start_time for show in shows
+                      if show.start_time > now), None))
+
+    return render_template('pages/show_artist.html', artist=data)
+
+
+#  ----------------------------------------------------------------
+#  Update
+#  ----------------------------------------------------------------
+
+# forms (WTForms, Flask-WTF) are imported by the views rendering them, so
+# that starting a worker doesn't pay for them
+
+@artists.route('/<int:artist_id>/edit', methods=['GET'])
+def edit(artist_id):
+    from forms import ArtistForm
+    form = ArtistForm()
+    # DONE: populate form with fields from artist with ID <artist_id>
+    artist = Artist.query.get(artist_id)
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@artists.route('/<int:artist_id>/edit', methods=['POST'])
+def edit_submission(artist_id):
+    # DONE: take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+    from forms import ArtistForm
+    artist = Artist.query.get(artist_id)
+
+    form = ArtistForm(request.form, meta={"csrf": False})
+
+    # Enforce form fields validation, rejecting malformed data
+    if not form.validate():
+        for k, v in form.errors.items():
+            flash(f"Artist not saved: {v[0]}")
+        return redirect(url_for('.edit_submission', artist_id=artist_id))
+    else:
+        error = False
+        # the form returns a list of genres names (strings) whereas the
+        # genres m2m relationship requires a list of Genre objects.
+        # Turn the list of Genre names into a list of Genre objects
+        genres, unknown = resolve_genres(form.genres.data)
+        if unknown:
+            flash(f"Artist not saved: unknown genre {', '.join(unknown)}")
+            return redirect(url_for('.edit_submission', artist_id=artist_id))
+
+        artist.name = form.name.data.strip()
+        artist.city = form.city.data.strip()
+        artist.state = form.state.data
+        artist.phone = re.sub(
+            "\D", "", form.phone.data.strip())  # strip non-digits
+        artist.genre = genres
+        artist.seeking_venue = True if form.seeking_venue.data == "Yes" else False
+        artist.seeking_description = form.seeking_description.data.strip()
+        artist.image_link = form.image_link.data.strip()
+        artist.website = form.website.data.strip()
+        artist.facebook_link = form.facebook_link.data.strip()
+
+        try:
+            db.session.add(artist)
+            db.session.commit()
+            flash(f"Artist {artist.name} was successfully listed!")
+        except Exception as e:
+            print(sys.exc_info())
+            print(e)
+            error = True
+            db.session.rollback()
+        finally:
+            db.session.close()
+
+        if error:
+            # DONE: on unsuccessful db insert, flash an error instead.
+            flash(f"Artist {artist.name} could not be listed.")
+            abort(500)
+
+    return redirect(url_for('.show', artist_id=artist_id))
+
+
+#  ----------------------------------------------------------------
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@artists.route('/create', methods=['GET'])
+def create_form():
+    from forms import ArtistForm
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@artists.route('/create', methods=['POST'])
+def create_submission():
+    # called upon submitting the new artist listing form
+    # DONE: insert form data as a new Venue record in the db, instead
+    # DONE: modify data to be the data object returned from db insertion
+    from forms import ArtistForm
+    form = ArtistForm(request.form, meta={"csrf": False})
+
+    # Enforce form fields validation, rejecting malformed data
+    if not form.validate():
+        for k, v in form.errors.items():
+            flash(f"Artist not saved: {v[0]}")
+        return redirect(url_for('.create_submission'))
+    else:
+        error = False
+        # the form returns a list of genres names (strings) whereas the
+        # genres m2m relationship requires a list of Genre objects.
+        # Turn the list of Genre names into a list of Genre objects
+        genres, unknown = resolve_genres(form.genres.data)
+        if unknown:
+            flash(f"Artist not saved: unknown genre {', '.join(unknown)}")
+            return redirect(url_for('.create_submission'))
+        if current_app.config["WRITE_BEHIND"]:
+            return accepted("artists", f"Artist {form.name.data.strip()}")
+
+        artist = Artist(
+            name=form.name.data.strip(),
+            city=form.city.data.strip(),
+            state=form.state.data,
+            # strip non-digits
+            phone=re.sub("\D", "", form.phone.data.strip()),
+            genre=genres,
+            seeking_venue=True if form.seeking_venue.data == "Yes" else False,
+            seeking_description=form.seeking_description.data.strip(),
+            image_link=form.image_link.data.strip(),
+            website=form.website.data.strip(),
+            facebook_link=form.facebook_link.data.strip(),
+        )
+
+        try:
+            db.session.add(artist)
+            db.session.commit()
+            flash(f"Artist {artist.name} was successfully listed!")
+        except Exception as e:
+            print(sys.exc_info())
+            print(e)
+            error = True
+            db.session.rollback()
+        finally:
+            db.session.close()
+
+        if error:
+            # DONE: on unsuccessful db insert, flash an error instead.
+            flash(f"Artist {artist.name} could not be listed.")
+            abort(500)
+
+    return redirect(url_for('index'))
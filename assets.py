@@ -0,0 +1,249 @@
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+
+import click
+from flask import Blueprint, abort, current_app, request, \
+    send_from_directory, url_for
+
+try:
+    # optional: brotli variants, ~15% smaller than gzip for text
+    import brotli
+except ImportError:
+    brotli = None
+
+
+assets = Blueprint("assets", __name__, url_prefix="/assets")
+
+
+# ----------------------------------------------------------------------------#
+# Bundles.
+# ----------------------------------------------------------------------------#
+
+# Files of static/, concatenated in order into one file per bundle, so that
+# a page costs four requests instead of eleven. CSS is minified; the
+# JavaScript files are already minified (or tiny), they are concatenated.
+BUNDLES = {
+    "main.css": [
+        "css/bootstrap.min.css",
+        "css/layout.main.css",
+        "css/main.css",
+        "css/main.responsive.css",
+        "css/main.quickfix.css",
+    ],
+    # loaded in <head>: modernizr must run before the page renders
+    "head.js": [
+        "js/libs/modernizr-2.8.2.min.js",
+        "js/libs/moment.min.js",
+    ],
+    "main.js": [
+        "js/libs/jquery-1.11.1.min.js",
+        "js/libs/bootstrap-3.1.1.min.js",
+        "js/plugins.js",
+        "js/script.js",
+    ],
+    # IE < 9 only
+    "respond.js": [
+        "js/libs/respond-1.4.2.min.js",
+    ],
+}
+
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+CSS_SPACE = re.compile(r"\s+")
+CSS_PUNCTUATION = re.compile(r"\s*([{}:;,>])\s*")
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+# files smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 256
+
+
+def minify_css(text):
+    """Whitespace and comment removal, enough for the hand written
+    stylesheets of static/css (no strings containing those characters)."""
+    text = CSS_COMMENT.sub("", text)
+    text = CSS_SPACE.sub(" ", text)
+    text = CSS_PUNCTUATION.sub(r"\1", text)
+    return text.replace(";}", "}").strip()
+
+
+def absolute_urls(text, path, static_url_path):
+    """Make the relative url()s of the stylesheet at path (relative to
+    static/) absolute: the bundle is served from another directory."""
+    def replace(match):
+        quote, url = match.groups()
+        if re.match(r"^(/|data:|https?:|#)", url):
+            return match.group(0)
+        resolved = posixpath.normpath(
+            posixpath.join(posixpath.dirname(path), url))
+        return f"url({quote}{static_url_path}/{resolved}{quote})"
+    return CSS_URL.sub(replace, text)
+
+
+def build_bundle(static_folder, static_url_path, name, paths):
+    """Return the content (bytes) of the bundle name."""
+    parts = list()
+    for path in paths:
+        with open(os.path.join(static_folder, path), encoding="utf-8") as f:
+            text = f.read()
+        if name.endswith(".css"):
+            text = absolute_urls(text, path, static_url_path)
+            if ".min." not in path:
+                text = minify_css(text)
+        else:
+            # drop the source map reference, the map is not bundled
+            text = re.sub(r"^//[#@] sourceMappingURL=.*$", "", text,
+                          flags=re.M).rstrip()
+            # a file without a trailing semicolon must not run into the
+            # next one
+            text += ";"
+        parts.append(text)
+    return "\n".join(parts).encode()
+
+
+def write_file(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def build(static_folder, static_url_path, output):
+    """Write every bundle to output as <name>.<hash>.<ext>, with its .gz
+    (and .br) variants and a manifest.json mapping bundle names to file
+    names. Returns the manifest.
+    The files of the previous build (manifest.previous.json) are kept:
+    the pages rendered before a deploy, in browsers or in the response
+    cache, still link them. Older builds are removed."""
+    os.makedirs(output, exist_ok=True)
+    current = load_manifest(output)
+    previous = load_manifest(output, "manifest.previous.json")
+    manifest = dict()
+    for name, paths in BUNDLES.items():
+        content = build_bundle(static_folder, static_url_path, name, paths)
+        stem, ext = os.path.splitext(name)
+        filename = f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+        write_file(os.path.join(output, filename), content)
+        if len(content) >= MIN_COMPRESS_SIZE:
+            # mtime=0: the same input builds the same .gz
+            write_file(os.path.join(output, filename + ".gz"),
+                       gzip.compress(content, 9, mtime=0))
+            if brotli is not None:
+                write_file(os.path.join(output, filename + ".br"),
+                           brotli.compress(content, quality=11))
+        manifest[name] = filename
+    if current is not None and current != manifest:
+        previous = current
+    write_manifest(output, "manifest.previous.json", previous or {})
+    write_manifest(output, "manifest.json", manifest)
+    kept = {"manifest.json", "manifest.previous.json"}
+    for filename in list(manifest.values()) + list((previous or {}).values()):
+        kept |= {filename, filename + ".gz", filename + ".br"}
+    for entry in os.scandir(output):
+        if entry.name not in kept:
+            os.remove(entry.path)
+    return manifest
+
+
+def write_manifest(output, name, manifest):
+    # written aside and renamed: a worker starting meanwhile reads either
+    tmp = os.path.join(output, name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(output, name))
+
+
+def load_manifest(output, name="manifest.json"):
+    try:
+        with open(os.path.join(output, name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def manifest_version(manifest):
+    """A short hash of the manifest, "" without a build."""
+    if manifest is None:
+        return ""
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode())\
+        .hexdigest()[:12]
+
+
+# ----------------------------------------------------------------------------#
+# Serving.
+# ----------------------------------------------------------------------------#
+
+def assets_version():
+    """The version of the bundles the pages of this process link to. Part
+    of the validators and cache keys of the pages (see conditional.py and
+    cache.py): after a deploy with new bundles, neither a browser nor the
+    response cache keeps a page linking the old ones."""
+    return current_app.extensions["assets_version"]
+
+
+def asset_urls(name):
+    """URLs to load the bundle name from, in a template:
+    {% for url in asset_urls("main.css") %}<link href="{{ url }}" ...>
+    One fingerprinted URL once `flask assets build` ran, else the URLs of
+    the source files (development)."""
+    manifest = current_app.extensions["assets_manifest"]
+    if manifest is not None and name in manifest:
+        return [url_for("assets.asset", filename=manifest[name])]
+    return [url_for("static", filename=path) for path in BUNDLES[name]]
+
+
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+@assets.route("/<filename>")
+def asset(filename):
+    """A built file: its name changes with its content, so it can be
+    cached forever. Served precompressed when the client accepts it."""
+    output = current_app.config["ASSETS_OUTPUT"]
+    if filename.startswith("manifest.") or \
+            not os.path.isfile(os.path.join(output, filename)):
+        abort(404)
+    encoding = None
+    served = filename
+    for name, suffix in ENCODINGS:
+        # the quality of name, 0 when refused ("br;q=0") or not listed
+        if request.accept_encodings[name] > 0 and \
+                os.path.isfile(os.path.join(output, filename + suffix)):
+            encoding, served = name, filename + suffix
+            break
+    response = send_from_directory(output, served, conditional=True)
+    # the type of the original, not of the .gz/.br file
+    response.mimetype = "text/css" if filename.endswith(".css") \
+        else "application/javascript"
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+
+@assets.cli.command("build")
+def build_command():
+    """Bundle, minify, fingerprint and compress the static assets."""
+    output = current_app.config["ASSETS_OUTPUT"]
+    manifest = build(current_app.static_folder, current_app.static_url_path,
+                     output)
+    for name, filename in sorted(manifest.items()):
+        path = os.path.join(output, filename)
+        sizes = [f"{os.path.getsize(path)} B"] + [
+            f"{encoding} {os.path.getsize(path + suffix)} B"
+            for encoding, suffix in ENCODINGS
+            if os.path.isfile(path + suffix)]
+        click.echo(f"{name:12} {filename:28} {', '.join(sizes)}")
+
+
+def init_app(app):
+    """Load the manifest of the built assets (and its version) and
+    register the asset_urls template function and the /assets route."""
+    app.extensions["assets_manifest"] = load_manifest(
+        app.config["ASSETS_OUTPUT"])
+    app.extensions["assets_version"] = manifest_version(
+        app.extensions["assets_manifest"])
+    app.jinja_env.globals["asset_urls"] = asset_urls
+    app.register_blueprint(assets)
@@ -0,0 +1,19 @@
+"""Benchmarks of the fyyur routes against a generated catalog.
+
+    python -m bench.run --scale 10k
+    python -m bench.run --scale 1m --database postgresql://localhost/fyyur_bench
+    python -m bench.filters
+    python -m bench.startup --against REV
+
+See bench/run.py, bench/filters.py and bench/startup.py for the options.
+"""
+
+# Number of shows, and of the venues and artists they are spread over.
+# Kept apart from bench.data, which imports the app: the database URL must
+# be set before.
+SCALES = {
+    "1k": {"shows": 1000, "venues": 50, "artists": 100},
+    "10k": {"shows": 10000, "venues": 200, "artists": 500},
+    "100k": {"shows": 100000, "venues": 1000, "artists": 2500},
+    "1m": {"shows": 1000000, "venues": 5000, "artists": 10000},
+}
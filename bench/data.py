@@ -0,0 +1,137 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+from bench import SCALES
+from counters import recount
+from forms import VenueForm
+from models import db, Venue, Artist, Genre, Show, venue_genre, artist_genre
+
+
+GENRES = [name for name, label in VenueForm.genres.kwargs["choices"]]
+STATES = ["CA", "NY", "TX", "IL", "WA", "FL", "MA", "LA", "TN", "CO"]
+CITIES = ["San Francisco", "New York", "Austin", "Chicago", "Seattle",
+          "Miami", "Boston", "New Orleans", "Nashville", "Denver"]
+WORDS = ["Blue", "Red", "Golden", "Silver", "Velvet", "Electric", "Lonely",
+         "Wild", "Midnight", "Crystal", "Iron", "Paper", "Neon", "Hollow"]
+VENUE_KINDS = ["Hall", "Club", "Lounge", "Theatre", "Bar", "Room", "Arena"]
+ARTIST_KINDS = ["Band", "Trio", "Quartet", "Orchestra", "Collective", "Duo"]
+
+
+# ----------------------------------------------------------------------------#
+# Generator.
+# ----------------------------------------------------------------------------#
+
+# The catalog only depends on the scale and the seed: the same names,
+# genres and show slots, the latter placed around today's midnight so that
+# half of them are upcoming whenever the benchmark runs. Rows are written
+# with Core executemany in batches, with explicit ids.
+
+def name(rng, kinds, id):
+    return f"The {rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(kinds)}" \
+        f" {id}"
+
+
+def venue_rows(rng, count):
+    for id in range(1, count + 1):
+        place = rng.randrange(len(CITIES))
+        yield {
+            "id": id,
+            "name": name(rng, VENUE_KINDS, id),
+            "city": CITIES[place],
+            "state": STATES[place],
+            "address": f"{rng.randrange(1, 2000)} Main Street",
+            "phone": f"{rng.randrange(10 ** 9, 10 ** 10)}",
+            "image_link": "",
+            "facebook_link": "",
+            "website": "",
+            "seeking_talent": rng.random() < 0.3,
+            "seeking_description": "",
+            "updated_at": datetime.utcnow(),
+        }
+
+
+def artist_rows(rng, count):
+    for id in range(1, count + 1):
+        place = rng.randrange(len(CITIES))
+        yield {
+            "id": id,
+            "name": name(rng, ARTIST_KINDS, id),
+            "city": CITIES[place],
+            "state": STATES[place],
+            "phone": f"{rng.randrange(10 ** 9, 10 ** 10)}",
+            "image_link": "",
+            "facebook_link": "",
+            "website": "",
+            "seeking_venue": rng.random() < 0.3,
+            "seeking_description": "",
+            "updated_at": datetime.utcnow(),
+        }
+
+
+def genre_links(rng, count, foreign_key):
+    for id in range(1, count + 1):
+        for genre_id in rng.sample(range(1, len(GENRES) + 1),
+                                   rng.randint(1, 3)):
+            yield {foreign_key: id, "genre_id": genre_id}
+
+
+def show_rows(rng, count, venues, artists):
+    # one year before and after today's midnight, one hour long, on the hour:
+    # a slot already taken by the venue or the artist is drawn again, as
+    # double bookings are refused (see bookings.py)
+    anchor = datetime.combine(date.today(), time())
+    booked = set()
+    for id in range(1, count + 1):
+        while True:
+            venue_id = rng.randint(1, venues)
+            artist_id = rng.randint(1, artists)
+            hour = rng.randint(-8760, 8760)
+            if ("venue", venue_id, hour) not in booked and \
+                    ("artist", artist_id, hour) not in booked:
+                break
+        booked.add(("venue", venue_id, hour))
+        booked.add(("artist", artist_id, hour))
+        yield {
+            "id": id,
+            "venue_id": venue_id,
+            "artist_id": artist_id,
+            "start_time": anchor + timedelta(hours=hour),
+            "duration": 60,
+            "updated_at": datetime.utcnow(),
+        }
+
+
+def insert(table, rows, batch_size):
+    batch = list()
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            batch = list()
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def generate(scale, seed=0, batch_size=10000):
+    """Fill the (empty) database with the catalog of scale, one of
+    SCALES."""
+    counts = SCALES[scale]
+    rng = random.Random(seed)
+    insert(Genre.__table__, ({"id": id, "name": genre} for id, genre in
+                             enumerate(GENRES, 1)), batch_size)
+    insert(Venue.__table__, venue_rows(rng, counts["venues"]), batch_size)
+    insert(Artist.__table__, artist_rows(rng, counts["artists"]), batch_size)
+    insert(venue_genre, genre_links(rng, counts["venues"], "venue_id"),
+           batch_size)
+    insert(artist_genre, genre_links(rng, counts["artists"], "artist_id"),
+           batch_size)
+    insert(Show.__table__, show_rows(rng, counts["shows"], counts["venues"],
+                                     counts["artists"]), batch_size)
+    if db.engine.dialect.name == "postgresql":
+        # the ids were explicit: move the sequences past them
+        for table in ("genre", "venue", "artist", "show"):
+            db.session.execute(f"SELECT setval('{table}_id_seq', "
+                               f"(SELECT max(id) FROM \"{table}\"))")
+    db.session.commit()
+    # the shows were inserted without the ORM: count them once
+    recount()
@@ -0,0 +1,76 @@
+"""Time the datetime template filter against the one it replaced.
+
+    python -m bench.filters [--calls 20000]
+
+The previous filter parsed a string with dateutil and handed it to
+babel.dates.format_datetime, which parses the pattern and the locale again
+on every call. The current one (app.format_datetime) takes the datetime
+objects the views pass and applies a pattern compiled once. Each format is
+timed both ways, and with a string for the current filter's fallback path.
+The exit status is 1 when a format renders differently.
+"""
+import argparse
+import sys
+import timeit
+from datetime import datetime
+
+
+FORMATS = ["full", "medium", "short", "long", "EEE d MMM y"]
+VALUE = datetime(2035, 4, 1, 20, 30)
+
+
+def previous_format_datetime(value, format='medium'):
+    """The filter before the patterns were cached."""
+    import babel.dates
+    import dateutil.parser
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def rate(function, calls):
+    """Calls per second of function, the best of three runs."""
+    return calls / min(timeit.repeat(function, number=calls, repeat=3))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.filters",
+        description="Time the datetime template filter against the one it "
+                    "replaced.")
+    parser.add_argument("--calls", type=int, default=20000,
+                        help="Calls per timed run.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from app import format_datetime
+
+    text = str(VALUE)
+    failures = list()
+    print(f"{'format':14} {'previous/s':>11} {'datetime/s':>11} "
+          f"{'string/s':>11} {'speedup':>8}")
+    for format in FORMATS:
+        expected = previous_format_datetime(text, format)
+        for value in (VALUE, text):
+            if format_datetime(value, format) != expected:
+                failures.append(f"{format}: {format_datetime(value, format)!r}"
+                                f" instead of {expected!r}")
+        previous = rate(lambda: previous_format_datetime(text, format),
+                        args.calls)
+        native = rate(lambda: format_datetime(VALUE, format), args.calls)
+        parsed = rate(lambda: format_datetime(text, format), args.calls)
+        print(f"{format:14} {previous:>11,.0f} {native:>11,.0f} "
+              f"{parsed:>11,.0f} {native / previous:>7.1f}x")
+
+    for failure in failures:
+        print("MISMATCH " + failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""Time the routes of the app against a generated catalog.
+
+    python -m bench.run [--scale 10k] [--database URL] [--requests 50]
+                        [--route /shows ...] [--max-queries N]
+                        [--baseline FILE] [--save FILE]
+
+Each route is requested --requests times (after one warm-up request)
+through the Flask test client, and reported with its p50/p99 latency, the
+SQL statements it ran per request and the peak memory allocated by one
+more request (tracemalloc, which would skew the timings). The database
+(SQLite in a temporary directory by default) is generated on the first
+run of a scale and reused that day, while the schema and the generator
+are unchanged (see catalog_file). The exit status is 1 when a route
+runs more than --max-queries statements, or is more than --tolerance
+slower (p50) or hungrier (peak allocations) than in the --baseline file
+written by --save: both catch regressions before a deploy.
+"""
+import argparse
+import glob
+import hashlib
+import inspect
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+from bench import SCALES
+
+
+# ----------------------------------------------------------------------------#
+# Routes.
+# ----------------------------------------------------------------------------#
+
+# (method, path, form data); ids are picked in the middle of the catalog
+def routes(counts):
+    venue_id = counts["venues"] // 2
+    artist_id = counts["artists"] // 2
+    return [
+        ("GET", "/", None),
+        ("GET", "/venues", None),
+        ("GET", "/artists", None),
+        ("GET", "/shows", None),
+        ("GET", f"/venues/{venue_id}", None),
+        ("GET", f"/artists/{artist_id}", None),
+        ("POST", "/venues/search", {"search_term": "blue hall"}),
+        ("POST", "/artists/search", {"search_term": "band"}),
+        ("GET", f"/venues/{venue_id}/edit", None),
+        ("GET", f"/artists/{artist_id}/edit", None),
+        ("GET", "/shows/create", None),
+        ("GET", "/api/v1/venues?fields=id,name,genres,num_upcoming_shows",
+         None),
+        ("GET", "/api/v1/shows?fields=id,start_time,venue_name,artist_name",
+         None),
+    ]
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of the sorted values."""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def measure(client, method, path, data, requests, statements):
+    """Returns a dict:
+    {"status": 200, "p50_ms": 1.2, "p99_ms": 3.4, "mean_ms": 1.4,
+     "queries": 2.0, "peak_kib": 310.5}
+    """
+    def request():
+        if method == "POST":
+            return client.post(path, data=data)
+        return client.get(path)
+
+    response = request()  # warm-up: first request hooks, caches
+    timings = list()
+    statements.clear()
+    for i in range(requests):
+        started = time.perf_counter()
+        request()
+        timings.append(1000 * (time.perf_counter() - started))
+    timings.sort()
+    queries = len(statements) / requests
+    tracemalloc.start()
+    request()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "status": response.status_code,
+        "p50_ms": round(percentile(timings, 50), 2),
+        "p99_ms": round(percentile(timings, 99), 2),
+        "mean_ms": round(sum(timings) / len(timings), 2),
+        "queries": round(queries, 1),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+# ----------------------------------------------------------------------------#
+# Catalog.
+# ----------------------------------------------------------------------------#
+
+def catalog_file(scale, seed):
+    """Path of the SQLite catalog of scale and seed. The name holds the day
+    it was generated, as its shows are placed around that day (half of
+    them upcoming), and a hash of the schema of the models and of the
+    generator. create_all() does not migrate, so a catalog of an older
+    schema, or day, is generated again in a new file; the previous files
+    of the scale and seed are removed."""
+    from sqlalchemy.dialects import sqlite
+    from sqlalchemy.schema import CreateIndex, CreateTable
+    import bench.data
+    from models import db
+
+    dialect = sqlite.dialect()
+    digest = hashlib.sha256(inspect.getsource(bench.data).encode())
+    for table in db.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect))
+                      .encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect))
+                          .encode())
+    prefix = os.path.join(tempfile.gettempdir(),
+                          f"fyyur-bench-{scale}-{seed}-")
+    path = f"{prefix}{date.today():%Y%m%d}-{digest.hexdigest()[:12]}.db"
+    for previous in glob.glob(glob.escape(prefix) + "*.db"):
+        if previous != path:
+            os.remove(previous)
+    return path
+
+
+def missing_columns(engine):
+    """The columns of the models which the tables of the database lack,
+    e.g. created by an older schema."""
+    from sqlalchemy import inspect as inspect_database
+    from models import db
+
+    inspector = inspect_database(engine)
+    tables = set(inspector.get_table_names())
+    missing = list()
+    for table in db.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        columns = {column["name"]
+                   for column in inspector.get_columns(table.name)}
+        missing += [f"{table.name}.{column.name}" for column in table.columns
+                    if column.name not in columns]
+    return missing
+
+
+# ----------------------------------------------------------------------------#
+# Command.
+# ----------------------------------------------------------------------------#
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.run",
+        description="Time the routes of the app against a generated "
+                    "catalog.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--database",
+                        help="Database URL, by default an SQLite file in "
+                             "the temporary directory (one per scale, "
+                             "schema and day).")
+    parser.add_argument("--requests", type=int, default=50,
+                        help="Timed requests per route.")
+    parser.add_argument("--route", action="append",
+                        help="Only the routes starting with this path "
+                             "(repeatable).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-queries", type=float,
+                        help="Fail when a route runs more statements per "
+                             "request.")
+    parser.add_argument("--baseline",
+                        help="Results of a previous run (--save) to compare "
+                             "with.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed p50 slowdown, and peak allocations "
+                             "growth, over the baseline.")
+    parser.add_argument("--save", help="Write the results to this file.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    database = args.database or \
+        "sqlite:///" + catalog_file(args.scale, args.seed)
+    # read by config.py: must be set before the app is imported
+    os.environ["DATABASE_URL"] = database
+
+    from sqlalchemy import event
+    from app import create_app
+    from bench.data import generate
+    from models import db, Show
+
+    app = create_app()
+    counts = SCALES[args.scale]
+    statements = list()
+    with app.app_context():
+        if db.engine.dialect.name == "postgresql":
+            db.session.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            db.session.commit()
+        missing = missing_columns(db.engine)
+        if missing:
+            # an older schema, which create_all() would not change
+            print(f"{database} lacks {', '.join(missing)}: upgrade it "
+                  f"(flask db upgrade) or drop it", file=sys.stderr)
+            return 2
+        db.create_all()
+        if db.session.query(Show.id).first() is None:
+            started = time.perf_counter()
+            generate(args.scale, args.seed)
+            print(f"generated the {args.scale} catalog in "
+                  f"{time.perf_counter() - started:.1f} s", file=sys.stderr)
+        db.session.remove()
+
+        event.listen(db.engine, "before_cursor_execute",
+                     lambda *a: statements.append(a[2]))
+
+    client = app.test_client()
+    results = dict()
+    print(f"{'route':62} {'status':>6} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'queries':>7} {'peak KiB':>9}")
+    for method, path, data in routes(counts):
+        if args.route and not any(path.startswith(prefix)
+                                  for prefix in args.route):
+            continue
+        name = f"{method} {path}"
+        result = measure(client, method, path, data, args.requests,
+                         statements)
+        results[name] = result
+        print(f"{name:62} {result['status']:>6} {result['p50_ms']:>8.2f} "
+              f"{result['p99_ms']:>8.2f} {result['queries']:>7.1f} "
+              f"{result['peak_kib']:>9.1f}")
+
+    failures = list()
+    if args.max_queries is not None:
+        failures += [f"{name}: {result['queries']} queries per request"
+                     for name, result in results.items()
+                     if result["queries"] > args.max_queries]
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["routes"]
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before and result["p50_ms"] > \
+                    before["p50_ms"] * (1 + args.tolerance):
+                failures.append(f"{name}: p50 {result['p50_ms']} ms, was "
+                                f"{before['p50_ms']} ms")
+            if before and result["queries"] > before["queries"]:
+                failures.append(f"{name}: {result['queries']} queries per "
+                                f"request, was {before['queries']}")
+            if before and "peak_kib" in before and result["peak_kib"] > \
+                    before["peak_kib"] * (1 + args.tolerance):
+                failures.append(f"{name}: peak allocations "
+                                f"{result['peak_kib']} KiB, was "
+                                f"{before['peak_kib']} KiB")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"scale": args.scale, "seed": args.seed,
+                       "routes": results}, f, indent=2)
+
+    for failure in failures:
+        print("REGRESSION " + failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
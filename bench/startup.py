@@ -0,0 +1,142 @@
+"""Time the cold start of the app: import it and build it, in fresh
+processes.
+
+    python -m bench.startup [--runs 15] [--against REV]
+
+Each run is a new interpreter importing app and calling create_app(), as a
+worker does when it boots; the time is measured inside the process, from
+before the import to the built app. One more run with -X importtime adds
+up the time spent importing each package, to tell which ones weigh. With --against, the same is measured on the tree of REV (a git
+revision, checked out in a temporary directory), e.g. the last release:
+before the factory, importing app built the app.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the app is built at import when app has no factory
+STARTUP = """
+import time
+started = time.perf_counter()
+import app
+if hasattr(app, "create_app"):
+    app.create_app()
+print(1000 * (time.perf_counter() - started))
+"""
+
+IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| *(\S+)")
+
+
+def run(tree, env, importtime=False):
+    """One fresh process starting the app of tree: its start time in ms,
+    and the -X importtime lines."""
+    command = [sys.executable] + (["-X", "importtime"] if importtime
+                                  else []) + ["-c", STARTUP]
+    process = subprocess.run(command, cwd=tree, env=env,
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"{tree}: {process.stderr.strip()}")
+    return float(process.stdout.split()[-1]), process.stderr
+
+
+def import_totals(stderr):
+    """(total ms, {package: cumulative ms}) of -X importtime: the time of
+    every import, and that of each package (flask, sqlalchemy, wtforms...)
+    where it was first imported, its modules included."""
+    total = 0
+    packages = dict()
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match is None:
+            continue
+        own, cumulative, name = match.groups()
+        total += int(own)
+        if "." not in name and name != "app":
+            packages[name] = int(cumulative) / 1000
+    return total / 1000, packages
+
+
+def measure(tree, runs, env):
+    """Returns a dict:
+    {"median_ms": 259.1, "min_ms": 250.3, "import_ms": 231.0,
+     "packages": {"flask": 80.2, ...}}
+    """
+    timings = [run(tree, env)[0] for i in range(runs)]
+    total, packages = import_totals(run(tree, env, importtime=True)[1])
+    return {
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "import_ms": total,
+        "packages": packages,
+    }
+
+
+def checkout(revision, directory):
+    """Extract the tree of revision into directory."""
+    archive = os.path.join(directory, "tree.tar")
+    with open(archive, "wb") as f:
+        subprocess.run(["git", "archive", revision], cwd=ROOT, stdout=f,
+                       check=True)
+    tree = os.path.join(directory, "tree")
+    with tarfile.open(archive) as tar:
+        tar.extractall(tree)
+    return tree
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.startup",
+        description="Time the cold start of the app in fresh processes.")
+    parser.add_argument("--runs", type=int, default=15,
+                        help="Processes started per tree.")
+    parser.add_argument("--against",
+                        help="Git revision to compare with, e.g. the last "
+                             "release.")
+    parser.add_argument("--top", type=int, default=8,
+                        help="Heaviest packages listed per tree.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as directory:
+        # nothing is queried: the database only has to be a valid URL
+        env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.join(
+            directory, "startup.db"))
+        trees = [("working tree", ROOT)]
+        if args.against:
+            trees.append((args.against, checkout(args.against, directory)))
+            # byte-compile it once, as the working tree is
+            subprocess.run([sys.executable, "-m", "compileall", "-q",
+                            trees[-1][1]], check=True)
+        results = [(name, measure(tree, args.runs, env))
+                   for name, tree in trees]
+
+    print(f"{'tree':16} {'median ms':>10} {'min ms':>8} {'imports ms':>11}")
+    for name, result in results:
+        print(f"{name:16} {result['median_ms']:>10.1f} "
+              f"{result['min_ms']:>8.1f} {result['import_ms']:>11.1f}")
+    for name, result in results:
+        heaviest = sorted(result["packages"].items(),
+                          key=lambda item: -item[1])
+        print(f"\n{name}, heaviest imports (ms, dependencies included):")
+        for package, ms in heaviest[:args.top]:
+            print(f"  {package:30} {ms:>8.1f}")
+    if args.against:
+        now, before = results[0][1], results[1][1]
+        print(f"\ncold start {now['median_ms']:.0f} ms, was "
+              f"{before['median_ms']:.0f} ms at {args.against} "
+              f"({before['median_ms'] / now['median_ms']:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import timedelta
+
+from models import db, Show, MAX_SHOW_DURATION
+
+
+# ----------------------------------------------------------------------------#
+# Double bookings.
+# ----------------------------------------------------------------------------#
+
+# A venue, like an artist, has one show at a time: a show, from start_time
+# to start_time + duration, may not overlap another show of its venue or
+# artist. No show lasts more than MAX_SHOW_DURATION, so the only shows which
+# can overlap [start, end) start in (start - MAX_SHOW_DURATION, end): a
+# range of the (venue_id|artist_id, start_time) indexes, a handful of rows
+# however many shows there are. On PostgreSQL, exclusion constraints (see
+# models.py) also refuse the overlaps of concurrent bookings.
+
+MAX_DURATION = timedelta(minutes=MAX_SHOW_DURATION)
+
+
+def end_of(start_time, duration):
+    return start_time + timedelta(minutes=duration)
+
+
+def conflict(venue_id, artist_id, start_time, duration):
+    """Return an error message if the show given would overlap a show of
+    its venue or artist, else None. One statement, two index ranges."""
+    end_time = end_of(start_time, duration)
+
+    def overlapping(foreign_key, id):
+        return db.session.query(Show.start_time, Show.duration)\
+            .filter(foreign_key == id)\
+            .filter(Show.start_time > start_time - MAX_DURATION)\
+            .filter(Show.start_time < end_time)
+    rows = overlapping(Show.venue_id, venue_id).add_columns(
+            db.literal("venue_id").label("side"))\
+        .union_all(overlapping(Show.artist_id, artist_id).add_columns(
+            db.literal("artist_id").label("side")))
+    for show_start, show_duration, side in rows:
+        if end_of(show_start, show_duration) > start_time:
+            return booked(side, venue_id if side == "venue_id" else artist_id,
+                          show_start)
+    return None
+
+
+def booked(side, id, start_time):
+    kind = "venue" if side == "venue_id" else "artist"
+    return f"{side}: {kind} {id} has a show at {start_time:%Y-%m-%d %H:%M}"
+
+
+class Timeline(object):
+    """The shows of one venue or artist as (start, end) pairs sorted by
+    start: an overlap check is a bisection, O(log n) plus the few shows
+    started in the MAX_DURATION before the end."""
+
+    def __init__(self):
+        self.shows = list()
+
+    def overlap(self, start, end):
+        """The start of a show overlapping [start, end), or None."""
+        first = bisect_left(self.shows, (start - MAX_DURATION,))
+        last = bisect_left(self.shows, (end,))
+        for show_start, show_end in self.shows[first:last]:
+            if show_end > start:
+                return show_start
+        return None
+
+    def add(self, start, end):
+        insort(self.shows, (start, end))
+
+
+# windows per statement, of 3 parameters each: SQLite bounds the number of
+# parameters (999 before 3.32) and the depth of an expression, which a long
+# OR reaches
+WINDOWS_PER_STATEMENT = 100
+
+# the statements of nearby(), per side; built once, and compiled once per
+# engine through COMPILED_CACHE: a batch only binds new parameters
+STATEMENTS = dict()
+COMPILED_CACHE = dict()
+
+
+def windows(records, side):
+    """The (id, lower, upper) ranges of start times which may overlap the
+    records, per venue or artist (side): for each record, (start -
+    MAX_DURATION, end), merged when they overlap."""
+    spans = defaultdict(list)
+    for record in records:
+        spans[record[side]].append((
+            record["start_time"] - MAX_DURATION,
+            end_of(record["start_time"], record["duration"])))
+    for id, pairs in spans.items():
+        pairs.sort()
+        lower, upper = pairs[0]
+        for start, end in pairs[1:]:
+            if start > upper:
+                yield id, lower, upper
+                lower = start
+            upper = max(upper, end)
+        yield id, lower, upper
+
+
+def statement(side):
+    """SELECT the shows of WINDOWS_PER_STATEMENT (id, lower, upper) windows
+    of side, as parameters id_<i>, lower_<i> and upper_<i>."""
+    if side not in STATEMENTS:
+        table = Show.__table__
+        STATEMENTS[side] = db.select([
+            table.c.id, table.c.venue_id, table.c.artist_id,
+            table.c.start_time, table.c.duration]).where(db.or_(*[
+                db.and_(table.c[side] == db.bindparam(f"id_{i}"),
+                        table.c.start_time > db.bindparam(f"lower_{i}"),
+                        table.c.start_time < db.bindparam(f"upper_{i}"))
+                for i in range(WINDOWS_PER_STATEMENT)]))
+    return STATEMENTS[side]
+
+
+def nearby(records):
+    """The shows which may overlap the records, as (id, venue_id,
+    artist_id, start_time, duration) rows: a range of an index per venue
+    and artist of the records, rather than the time span of the whole
+    batch, so that an import reads each show about once. A show can be
+    returned twice."""
+    connection = db.session.connection().execution_options(
+        compiled_cache=COMPILED_CACHE)
+    for side in ("venue_id", "artist_id"):
+        ranges = list(windows(records, side))
+        for i in range(0, len(ranges), WINDOWS_PER_STATEMENT):
+            chunk = ranges[i:i + WINDOWS_PER_STATEMENT]
+            # the last chunk repeats its last window: one statement per side
+            chunk += chunk[-1:] * (WINDOWS_PER_STATEMENT - len(chunk))
+            params = dict()
+            for j, (id, lower, upper) in enumerate(chunk):
+                params.update({f"id_{j}": id, f"lower_{j}": lower,
+                               f"upper_{j}": upper})
+            yield from connection.execute(statement(side), params)
+
+
+class Bookings(object):
+    """Overlap checks of a batch of show records (bulk imports): the
+    existing shows of their venues and artists around the records are read
+    in a few statements, and the shows of the batch are checked against
+    them and against each other in memory."""
+
+    def __init__(self, records):
+        self.timelines = {"venue_id": defaultdict(Timeline),
+                          "artist_id": defaultdict(Timeline)}
+        shows = {row[0]: row[1:] for row in nearby(records)}
+        for venue_id, artist_id, start_time, duration in shows.values():
+            self.add(venue_id, artist_id, start_time,
+                     end_of(start_time, duration))
+
+    def add(self, venue_id, artist_id, start, end):
+        self.timelines["venue_id"][venue_id].add(start, end)
+        self.timelines["artist_id"][artist_id].add(start, end)
+
+    def book(self, record):
+        """Return an error message if the show record overlaps a show of
+        its venue or artist; else add it to their timelines and return
+        None."""
+        start = record["start_time"]
+        end = end_of(start, record["duration"])
+        for side in ("venue_id", "artist_id"):
+            overlap = self.timelines[side][record[side]].overlap(start, end)
+            if overlap is not None:
+                return booked(side, record[side], overlap)
+        self.add(record["venue_id"], record["artist_id"], start, end)
+        return None
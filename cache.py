@@ -0,0 +1,359 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+
+import click
+from flask import current_app, g, request, session
+from sqlalchemy import event, inspect
+
+from assets import assets_version
+from compression import variants
+from models import db, Venue, Artist, Genre, Show
+
+
+# ----------------------------------------------------------------------------#
+# Cache backends.
+# ----------------------------------------------------------------------------#
+
+# A backend stores picklable values under string keys for at most `timeout`
+# seconds (0: until evicted). NullCache disables caching, LRUCache lives in
+# the memory of one process, FileSystemCache can be shared by the workers
+# of a host.
+
+class NullCache(object):
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class LRUCache(object):
+    """Bounded to max_entries, the least recently used entry is evicted
+    first."""
+
+    def __init__(self, max_entries=1024, default_timeout=300):
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.default_timeout
+        expires = time.monotonic() + timeout if timeout else None
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class FileSystemCache(object):
+    """One pickle file per entry in directory, written atomically. Every
+    PRUNE_INTERVAL writes, the oldest files beyond max_entries are
+    removed, so that entries made unreachable by an invalidation do not
+    pile up. The tag versions (see below) are the oldest files and on
+    every key: they are named apart and never pruned, or each prune would
+    invalidate the whole cache. There is one per venue and artist at
+    most."""
+
+    PRUNE_INTERVAL = 100
+    TAG_PREFIX = "tag-"
+
+    def __init__(self, directory, max_entries=1024, default_timeout=300):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self.writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        name = hashlib.sha1(key.encode()).hexdigest()
+        if key.startswith("tag:"):
+            name = self.TAG_PREFIX + name
+        return os.path.join(self.directory, name)
+
+    def get(self, key):
+        try:
+            with open(self.path(key), "rb") as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.PickleError):
+            return None
+        if expires is not None and expires <= time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.default_timeout
+        expires = time.time() + timeout if timeout else None
+        # dot files are being written, and left alone by prune
+        fd, tmp = tempfile.mkstemp(prefix=".", dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((expires, value), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path(key))
+        self.writes += 1
+        if self.writes % self.PRUNE_INTERVAL == 0:
+            self.prune()
+
+    def prune(self):
+        entries = list()
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith((self.TAG_PREFIX, ".")):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                pass
+        entries.sort()
+        for mtime, path in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+
+def shared(config):
+    """Whether the backend of config is seen by every process of the host,
+    so that a command (`flask import`, `flask rollover-shows`, `flask
+    journal-worker`) invalidates the pages the web workers cached: not
+    "lru", which lives in the memory of each process."""
+    return config["CACHE_TYPE"] != "lru"
+
+
+def warn_unshared():
+    """Called by the commands writing rows: with an "lru" backend, their
+    invalidations only reach their own process."""
+    config = current_app.config
+    if not shared(config):
+        click.echo(f"warning: CACHE_TYPE is \"lru\": the web workers serve "
+                   f"their cached pages for up to "
+                   f"{config['CACHE_DEFAULT_TIMEOUT']} s more, unaware of "
+                   f"these writes (use \"filesystem\")", err=True)
+
+
+def make_backend(config):
+    """Build the backend selected by CACHE_TYPE."""
+    if config["CACHE_TYPE"] == "lru":
+        return LRUCache(config["CACHE_MAX_ENTRIES"],
+                        config["CACHE_DEFAULT_TIMEOUT"])
+    if config["CACHE_TYPE"] == "filesystem":
+        return FileSystemCache(config["CACHE_DIR"],
+                               config["CACHE_MAX_ENTRIES"],
+                               config["CACHE_DEFAULT_TIMEOUT"])
+    return NullCache()
+
+
+# ----------------------------------------------------------------------------#
+# Tags.
+# ----------------------------------------------------------------------------#
+
+# Every entry is tagged with what it was rendered from ("venues",
+# "venue:4", ...). A tag has a version stored in the backend itself, and
+# the versions of its tags are part of an entry's key: invalidating a tag
+# gives it a new version, which makes every entry rendered under the old
+# one unreachable (they then age out). Since versions live in the backend,
+# a shared backend propagates invalidations to every worker.
+
+# every entry carries this tag, e.g. a genre rename invalidates them all
+CATALOG_TAG = "catalog"
+
+
+def tag_version(backend, tag):
+    version = backend.get("tag:" + tag)
+    if version is None:
+        # never restart from a previous version, or entries rendered under
+        # it would become reachable again
+        version = uuid.uuid4().hex
+        backend.set("tag:" + tag, version, 0)
+    return version
+
+
+def invalidate(*tags):
+    """Drop every cached entry carrying any of tags."""
+    backend = current_app.extensions["response_cache"]
+    for tag in tags:
+        backend.set("tag:" + tag, uuid.uuid4().hex, 0)
+
+
+def cache_until(when):
+    """Called by a cached view: its page changes at when (a datetime, e.g.
+    the start of the next upcoming show, which then stops being upcoming),
+    so it must not be served from the cache past that time."""
+    if when is not None and (g.get("cache_until") is None or
+                             when < g.cache_until):
+        g.cache_until = when
+
+
+def cached(*tags):
+    """Decorator caching the response of a GET view. tags are formatted
+    with the view arguments, e.g. @cached("venue:{venue_id}"). The key is
+    the full path (including the query string), the tag versions and the
+    version of the static bundles the page links (see assets.py).
+    Requests with pending flash messages bypass the cache, as the messages
+    are rendered into the page. An entry keeps its body compressed in each
+    encoding next to the identity body, for compression.compress_response
+    to send as is."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            backend = current_app.extensions["response_cache"]
+            if isinstance(backend, NullCache) or "_flashes" in session:
+                return view(**kwargs)
+
+            names = [tag.format(**kwargs) for tag in tags] + [CATALOG_TAG]
+            versions = [tag_version(backend, tag) for tag in names]
+            key = "view:" + request.full_path + ":" + ":".join(versions) + \
+                ":" + assets_version()
+
+            entry = backend.get(key)
+            if entry is not None:
+                response = current_app.response_class(
+                    entry["body"], entry["status"], entry["headers"])
+                # entries stored before compression existed have none
+                response.compressed = entry.get("compressed", {})
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            response = current_app.make_response(view(**kwargs))
+            timeout = current_app.config["CACHE_DEFAULT_TIMEOUT"]
+            if g.get("cache_until") is not None:
+                remaining = (g.cache_until - datetime.now()).total_seconds()
+                timeout = min(timeout, int(remaining))
+            if response.status_code == 200 and timeout > 0 and \
+                    not response.direct_passthrough:
+                body = response.get_data()
+                response.compressed = variants(body, response.mimetype,
+                                               current_app.config)
+                backend.set(key, {
+                    "body": body,
+                    "compressed": response.compressed,
+                    "status": response.status_code,
+                    "headers": [("Content-Type", response.content_type)],
+                }, timeout)
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
+
+
+# ----------------------------------------------------------------------------#
+# Write-driven invalidation.
+# ----------------------------------------------------------------------------#
+
+# The tags written by a transaction are collected while it flushes and
+# invalidated once it commits. Which pages show what:
+#   /venues          venue names, upcoming show counts
+#   /artists         artist names
+#   /shows           shows with their venue and artist names
+#   /venues/<id>     the venue, its genres, its shows and their artists
+#   /artists/<id>    the artist, its genres, its shows and their venues
+
+def show_tags(venue_id, artist_id):
+    return {"shows", "venues", f"venue:{venue_id}", f"artist:{artist_id}"}
+
+
+def dependent_tags(session, instance):
+    """Detail pages of the other side of the shows of a venue or artist,
+    which display its name and image."""
+    if isinstance(instance, Venue):
+        column, other, prefix = Show.venue_id, Show.artist_id, "artist"
+    else:
+        column, other, prefix = Show.artist_id, Show.venue_id, "venue"
+    rows = session.execute(db.select([other]).distinct()
+                           .where(column == instance.id))
+    return {f"{prefix}:{id}" for id, in rows if id is not None}
+
+
+def collect_existing(session, flush_context, instances):
+    """before_flush: tags of the rows about to be updated or deleted,
+    while their shows still reference them."""
+    tags = session.info.setdefault("cache_tags", set())
+    for instance in list(session.dirty) + list(session.deleted):
+        if isinstance(instance, Genre):
+            # linking a genre only touches its backref collections
+            if session.is_modified(instance, include_collections=False):
+                tags.add(CATALOG_TAG)
+        elif isinstance(instance, Venue):
+            tags |= {"venues", "shows", f"venue:{instance.id}"}
+            tags |= dependent_tags(session, instance)
+        elif isinstance(instance, Artist):
+            tags |= {"artists", "shows", f"artist:{instance.id}"}
+            tags |= dependent_tags(session, instance)
+        elif isinstance(instance, Show):
+            state = inspect(instance)
+            for venue_id in state.attrs.venue_id.history.sum():
+                tags.add(f"venue:{venue_id}")
+            for artist_id in state.attrs.artist_id.history.sum():
+                tags.add(f"artist:{artist_id}")
+            tags |= show_tags(instance.venue_id, instance.artist_id)
+
+
+def collect_new(session, flush_context):
+    """after_flush: tags of the inserted rows, which now have their ids."""
+    tags = session.info.setdefault("cache_tags", set())
+    for instance in session.new:
+        if isinstance(instance, Venue):
+            tags.add("venues")
+        elif isinstance(instance, Artist):
+            tags.add("artists")
+        elif isinstance(instance, Show):
+            tags |= show_tags(instance.venue_id, instance.artist_id)
+
+
+def invalidate_collected(session):
+    """after_commit: invalidate what the transaction wrote."""
+    tags = session.info.pop("cache_tags", None)
+    if tags:
+        invalidate(*tags)
+
+
+def discard_collected(session):
+    """after_rollback: nothing was written."""
+    session.info.pop("cache_tags", None)
+
+
+def init_app(app):
+    """Create the backend selected by CACHE_TYPE and hook invalidation."""
+    app.extensions["response_cache"] = make_backend(app.config)
+    # db.session is shared by every app: listen once
+    if not event.contains(db.session, "before_flush", collect_existing):
+        event.listen(db.session, "before_flush", collect_existing)
+        event.listen(db.session, "after_flush", collect_new)
+        event.listen(db.session, "after_commit", invalidate_collected)
+        event.listen(db.session, "after_rollback", discard_collected)
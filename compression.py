@@ -0,0 +1,131 @@
+import gzip
+import zlib
+
+from flask import current_app, request
+
+try:
+    # optional: brotli, ~15% smaller than gzip on the listing pages
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# ----------------------------------------------------------------------------#
+# Encoders.
+# ----------------------------------------------------------------------------#
+
+# Responses are compressed after the view, in the encoding the client
+# accepts that comes first in COMPRESS_ALGORITHMS. Bodies are compressed
+# whole; streamed bodies (the exports) chunk by chunk, each chunk flushed so
+# that the client still receives rows as they are read.
+# Responses served from the response cache carry their compressed variants,
+# made once when the entry is stored (see variants and cache.cached): a
+# cache hit is not compressed again.
+
+def available_encodings(config):
+    return [encoding for encoding in config["COMPRESS_ALGORITHMS"]
+            if encoding == "gzip" or (encoding == "br" and
+                                      brotli is not None)]
+
+
+def negotiate(config):
+    """The encoding to send the current response in, or None."""
+    for encoding in available_encodings(config):
+        if request.accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, config):
+    if encoding == "br":
+        return brotli.compress(data, quality=config["COMPRESS_BR_LEVEL"])
+    # mtime=0: the same body compresses to the same bytes
+    return gzip.compress(data, config["COMPRESS_LEVEL"], mtime=0)
+
+
+def compressible(mimetype, data, config):
+    return config["COMPRESS_ENABLED"] and \
+        mimetype in config["COMPRESS_MIMETYPES"] and \
+        len(data) >= config["COMPRESS_MIN_SIZE"]
+
+
+def variants(data, mimetype, config):
+    """Returns a dict: the body data compressed in every available
+    encoding, empty if it isn't worth compressing."""
+    if not compressible(mimetype, data, config):
+        return dict()
+    return {encoding: compress(data, encoding, config)
+            for encoding in available_encodings(config)}
+
+
+def compress_stream(iterable, charset, encoding, config):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=config["COMPRESS_BR_LEVEL"])
+        process, flush, finish = \
+            compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(config["COMPRESS_LEVEL"],
+                                      zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(charset)
+            if chunk:
+                yield process(chunk) + flush()
+        yield finish()
+    finally:
+        # the view's generator holds a database cursor
+        if hasattr(iterable, "close"):
+            iterable.close()
+
+
+# ----------------------------------------------------------------------------#
+# Middleware.
+# ----------------------------------------------------------------------------#
+
+def compress_response(response):
+    """after_request: compress the response if its type is in
+    COMPRESS_MIMETYPES, it is not smaller than COMPRESS_MIN_SIZE and the
+    client accepts one of COMPRESS_ALGORITHMS. Files (send_file, the
+    precompressed /assets) and partial content are left alone."""
+    config = current_app.config
+    if not config["COMPRESS_ENABLED"] or \
+            response.mimetype not in config["COMPRESS_MIMETYPES"]:
+        return response
+    # identity and compressed responses are different representations
+    response.vary.add("Accept-Encoding")
+    if response.status_code < 200 or \
+            response.status_code in (204, 206, 304) or \
+            "Content-Encoding" in response.headers or \
+            response.direct_passthrough or \
+            response.cache_control.no_transform:
+        return response
+    encoding = negotiate(config)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(
+            response.response, response.charset, encoding, config)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = getattr(response, "compressed", {}).get(encoding)
+        if data is None:
+            body = response.get_data()
+            if len(body) < config["COMPRESS_MIN_SIZE"]:
+                return response
+            data = compress(body, encoding, config)
+        response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    # like nginx: the ETag of the identity body, weak, still matches the
+    # If-None-Match of the next request (weakly compared)
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -0,0 +1,105 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import abort, current_app, request, session
+from werkzeug.http import is_resource_modified
+
+from assets import assets_version
+from models import db, Show
+
+
+# ----------------------------------------------------------------------------#
+# HTTP validators.
+# ----------------------------------------------------------------------------#
+
+# A venue or artist page changes when its row changes, when a show, venue
+# or artist it displays changes (both bump its updated_at, see
+# models.touch_related_pages) or when its next upcoming show starts and
+# moves to the past shows. All three are read in one statement, by primary
+# key and through the (venue_id|artist_id, start_time) indexes, so that an
+# unchanged page is answered with a 304 before any show is queried or any
+# template is rendered. The version of the static bundles is part of the
+# ETag: a page cached before a deploy links bundles of the previous build.
+
+def entity_validators(model, foreign_key, id, now=None):
+    """Return (etag, last_modified) for the page of the model row with id,
+    or None if it doesn't exist."""
+    if now is None:
+        now = datetime.now()
+    next_start = db.select([db.func.min(Show.start_time)])\
+        .where(foreign_key == model.id).where(Show.start_time > now)\
+        .as_scalar()
+    last_start = db.select([db.func.max(Show.start_time)])\
+        .where(foreign_key == model.id).where(Show.start_time <= now)\
+        .as_scalar()
+    row = db.session.query(model.updated_at, next_start, last_start)\
+        .filter(model.id == id).first()
+    if row is None:
+        return None
+    updated_at, next_start, last_start = row
+
+    # updated_at is UTC, start times are local times; like werkzeug, the
+    # result is a naive UTC datetime with the resolution of an HTTP date
+    last_modified = updated_at or datetime.min
+    if last_start is not None:
+        last_modified = max(last_modified, last_start.astimezone(
+            timezone.utc).replace(tzinfo=None))
+    last_modified = last_modified.replace(microsecond=0)
+    etag = hashlib.sha1(
+        f"{model.__tablename__}:{id}:{updated_at}:{next_start}:"
+        f"{assets_version()}".encode()
+    ).hexdigest()
+    return etag, last_modified
+
+
+def revalidate(response):
+    """Let clients keep the page but check it with us before reuse."""
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def conditional(model, foreign_key, argument):
+    """Decorator answering conditional GETs of a detail page, e.g.
+    @conditional(Venue, Show.venue_id, "venue_id"): the validators are
+    computed before the view runs, and a 304 is returned without running
+    it if the client's copy is current. Requests with pending flash
+    messages always get the full page."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if "_flashes" in session:
+                return view(**kwargs)
+            validators = entity_validators(model, foreign_key,
+                                           kwargs[argument])
+            if validators is None:
+                abort(404)
+            etag, last_modified = validators
+            if not is_resource_modified(request.environ, etag=etag,
+                                        last_modified=last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(**kwargs))
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            return revalidate(response)
+        return wrapper
+    return decorator
+
+
+def conditional_body(view):
+    """Decorator for the listing pages, whose content depends on too many
+    rows for a cheap validator: the ETag is a hash of the rendered body,
+    which still spares the transfer (and, with the response cache, the
+    rendering) of unchanged pages."""
+    @wraps(view)
+    def wrapper(**kwargs):
+        # rendering consumes the flash messages, check for them first
+        flashes = "_flashes" in session
+        response = current_app.make_response(view(**kwargs))
+        if response.status_code == 200 and not flashes:
+            response.add_etag()
+            response.make_conditional(request)
+            revalidate(response)
+        return response
+    return wrapper
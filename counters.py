@@ -0,0 +1,168 @@
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from sqlalchemy import event, inspect
+
+from cache import invalidate, warn_unshared
+from models import db, Venue, Artist, Show
+
+
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+
+# Venue and Artist .upcoming_show_count and .past_show_count count their
+# shows by Show.upcoming, so that /venues and the searches read them from
+# the row instead of counting shows. They change in the transaction which
+# inserts, moves or deletes a show (count_shows below, importer.insert_shows
+# for bulk imports), a deleted venue taking its shows along. A show stops
+# being upcoming when it starts: `flask rollover-shows`, run every few
+# minutes, moves the started shows to the past counts. Until it runs, they
+# are still counted as upcoming.
+
+def new_deltas():
+    """Returns a dict: {id: [upcoming delta, past delta]}."""
+    return defaultdict(lambda: [0, 0])
+
+
+def count(venues, artists, venue_id, artist_id, upcoming, sign):
+    """Add (sign 1) or remove (-1) a show to the deltas of its venue and
+    artist."""
+    for deltas, id in ((venues, venue_id), (artists, artist_id)):
+        if id is not None:
+            deltas[id][0 if upcoming else 1] += sign
+
+
+def shift_counts(session, model, deltas):
+    """Apply deltas to the counters of the model rows, in one
+    executemany."""
+    table = model.__table__
+    params = [{"_id": id, "_upcoming": upcoming, "_past": past}
+              for id, (upcoming, past) in deltas.items()
+              if upcoming or past]
+    if not params:
+        return
+    session.execute(
+        table.update().where(table.c.id == db.bindparam("_id")).values(
+            upcoming_show_count=table.c.upcoming_show_count +
+            db.bindparam("_upcoming"),
+            past_show_count=table.c.past_show_count + db.bindparam("_past")),
+        params)
+
+
+def previous(state, key):
+    """The value of the attribute key before this flush."""
+    history = state.attrs[key].history
+    return history.deleted[0] if history.deleted else getattr(state.obj(), key)
+
+
+def classify_shows(session, flush_context, instances):
+    """before_flush: a new show, or one whose start_time changed, is
+    upcoming if it starts later than now."""
+    now = datetime.now()
+    for instance in list(session.new) + list(session.dirty):
+        if isinstance(instance, Show) and (
+                instance in session.new or
+                inspect(instance).attrs.start_time.history.has_changes()):
+            instance.upcoming = instance.start_time is not None and \
+                instance.start_time > now
+
+
+def count_shows(session, flush_context):
+    """after_flush: the shows inserted, moved or deleted by this flush (the
+    new ones have their venue and artist ids by now)."""
+    venues, artists = new_deltas(), new_deltas()
+    for instance in session.new:
+        if isinstance(instance, Show):
+            count(venues, artists, instance.venue_id, instance.artist_id,
+                  instance.upcoming, 1)
+    for instance in session.deleted:
+        if isinstance(instance, Show):
+            state = inspect(instance)
+            count(venues, artists, previous(state, "venue_id"),
+                  previous(state, "artist_id"), previous(state, "upcoming"),
+                  -1)
+    for instance in session.dirty:
+        if isinstance(instance, Show):
+            state = inspect(instance)
+            before = [previous(state, key)
+                      for key in ("venue_id", "artist_id", "upcoming")]
+            after = [instance.venue_id, instance.artist_id, instance.upcoming]
+            if before != after:
+                count(venues, artists, *before, -1)
+                count(venues, artists, *after, 1)
+    shift_counts(session, Venue, venues)
+    shift_counts(session, Artist, artists)
+
+
+# ----------------------------------------------------------------------------#
+# Maintenance.
+# ----------------------------------------------------------------------------#
+
+def rollover(now=None, batch_size=1000):
+    """Move the upcoming shows started by now to the past counts of their
+    venues and artists, batch_size shows per transaction. The shows of a
+    batch are locked (on PostgreSQL), so that concurrent runs do not count
+    them twice. Returns the number of shows moved."""
+    if now is None:
+        now = datetime.now()
+    moved = 0
+    while True:
+        shows = db.session.query(Show.id, Show.venue_id, Show.artist_id)\
+            .filter(Show.upcoming, Show.start_time <= now)\
+            .order_by(Show.start_time).limit(batch_size)\
+            .with_for_update().all()
+        if not shows:
+            return moved
+        db.session.execute(Show.__table__.update()
+                           .where(Show.id.in_([show.id for show in shows]))
+                           .values(upcoming=False))
+        venues, artists = new_deltas(), new_deltas()
+        for show in shows:
+            count(venues, artists, show.venue_id, show.artist_id, True, -1)
+            count(venues, artists, show.venue_id, show.artist_id, False, 1)
+        shift_counts(db.session, Venue, venues)
+        shift_counts(db.session, Artist, artists)
+        db.session.commit()
+        moved += len(shows)
+
+
+def recount(now=None):
+    """Reclassify every show and recompute every counter from the shows,
+    e.g. after loading rows with plain INSERTs."""
+    if now is None:
+        now = datetime.now()
+    db.session.execute(Show.__table__.update()
+                       .values(upcoming=Show.start_time > now))
+    for model, foreign_key in ((Venue, Show.venue_id),
+                               (Artist, Show.artist_id)):
+        def shows(upcoming):
+            return db.select([db.func.count(Show.id)])\
+                .where(foreign_key == model.id)\
+                .where(Show.upcoming == upcoming).as_scalar()
+        db.session.execute(model.__table__.update().values(
+            upcoming_show_count=shows(True), past_show_count=shows(False)))
+    db.session.commit()
+
+
+def init_app(app):
+    """Hook the counting of shows and register the rollover command."""
+    # db.session is shared by every app: listen once
+    if not event.contains(db.session, "before_flush", classify_shows):
+        event.listen(db.session, "before_flush", classify_shows)
+        event.listen(db.session, "after_flush", count_shows)
+
+    @app.cli.command("rollover-shows")
+    @click.option("--recount", "full", is_flag=True,
+                  help="Recompute every counter from the shows instead.")
+    def rollover_command(full):
+        """Move the shows that started to the past show counts."""
+        warn_unshared()
+        if full:
+            recount()
+            click.echo("Recounted the shows of every venue and artist")
+        else:
+            click.echo(f"Moved {rollover()} started shows to the past")
+        # the upcoming show counts of /venues
+        invalidate("venues")
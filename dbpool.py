@@ -0,0 +1,113 @@
+import threading
+import time
+
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import exc
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+from models import db
+
+
+internal = Blueprint("internal", __name__, url_prefix="/internal")
+
+
+# ----------------------------------------------------------------------------#
+# Pool.
+# ----------------------------------------------------------------------------#
+
+class TimedQueuePool(QueuePool):
+    """QueuePool recording how long checkouts wait for a connection, i.e.
+    whether pool_size + max_overflow is too small for the workload."""
+
+    def __init__(self, *args, **kwargs):
+        super(TimedQueuePool, self).__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super(TimedQueuePool, self)._do_get()
+        except exc.TimeoutError:
+            with self.stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self.stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def stats(self):
+        with self.stats_lock:
+            checkouts = self.checkouts
+            return {
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(1000 * self.wait_total / checkouts, 3)
+                if checkouts else 0.0,
+                "wait_max_ms": round(1000 * self.wait_max, 3),
+            }
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the DB_POOL* settings. "null" opens a
+    connection per checkout, for a PgBouncer in transaction mode doing the
+    pooling. SQLite keeps the pool SQLAlchemy picks for it."""
+    if make_url(config["SQLALCHEMY_DATABASE_URI"]).drivername == "sqlite":
+        return {}
+    if config["DB_POOL"] == "null":
+        return {"poolclass": NullPool,
+                "pool_pre_ping": config["DB_POOL_PRE_PING"]}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+
+
+def pool_stats(pool):
+    """Returns a dict:
+    {"pool": "TimedQueuePool", "size": 5, "checked_out": 2, "overflow": -3,
+     "checkouts": 1042, "timeouts": 0, "wait_avg_ms": 0.02, ...}
+    """
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            # negative while the pool still has room before overflowing
+            "overflow": pool.overflow(),
+        })
+    if isinstance(pool, TimedQueuePool):
+        stats.update(pool.stats())
+    return stats
+
+
+# ----------------------------------------------------------------------------#
+# Endpoints.
+# ----------------------------------------------------------------------------#
+
+@internal.route("/pool")
+def pool():
+    if not current_app.config["DB_POOL_STATS"]:
+        return jsonify({"error": "disabled"}), 404
+    return jsonify(pool_stats(db.engine.pool))
+
+
+def init_app(app):
+    """Configure the engine pool, before the engine is created on first
+    use, and register the stats endpoint."""
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = dict(
+        engine_options(app.config), **app.config["SQLALCHEMY_ENGINE_OPTIONS"])
+    app.register_blueprint(internal)
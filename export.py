@@ -0,0 +1,150 @@
+import csv
+import io
+import sys
+from datetime import datetime
+from itertools import groupby
+
+import click
+from flask import Blueprint, Response, abort, current_app, \
+    stream_with_context
+
+from api import dumps
+from models import db, Venue, Artist, Genre, Show, venue_genre, artist_genre
+
+
+export = Blueprint("export", __name__, url_prefix="/export", cli_group=None)
+
+
+# ----------------------------------------------------------------------------#
+# Row streams.
+# ----------------------------------------------------------------------------#
+
+# Rows are read through a server-side cursor (stream_results, honoured by
+# psycopg2) in batches of EXPORT_BATCH_SIZE (yield_per) and encoded as they
+# come, so that memory use does not depend on the size of the catalog.
+
+def stream(query):
+    return query.execution_options(stream_results=True)\
+        .yield_per(current_app.config["EXPORT_BATCH_SIZE"])
+
+
+def entity_rows(model, table, foreign_key):
+    """Every venue or artist as a dict, with the list of its genre names.
+    The genres come from the same ordered, outer-joined statement: the
+    rows of one entity are contiguous and folded together."""
+    query = db.session.query(*model.__table__.columns,
+                             Genre.name.label("genre"))\
+        .select_from(model)\
+        .outerjoin(table, foreign_key == model.id)\
+        .outerjoin(Genre, Genre.id == table.c.genre_id)\
+        .order_by(model.id)
+    for id, rows in groupby(stream(query), key=lambda row: row.id):
+        rows = list(rows)
+        record = rows[0]._asdict()
+        del record["genre"]
+        record["genres"] = [row.genre for row in rows if row.genre]
+        yield record
+
+
+def show_rows():
+    query = db.session.query(*Show.__table__.columns).order_by(Show.id)
+    for row in stream(query):
+        yield row._asdict()
+
+
+EXPORTS = {
+    "venues": lambda: entity_rows(Venue, venue_genre, venue_genre.c.venue_id),
+    "artists": lambda: entity_rows(Artist, artist_genre,
+                                   artist_genre.c.artist_id),
+    "shows": show_rows,
+}
+
+COLUMNS = {
+    "venues": lambda: [column.key for column in Venue.__table__.columns] +
+    ["genres"],
+    "artists": lambda: [column.key for column in Artist.__table__.columns] +
+    ["genres"],
+    "shows": lambda: [column.key for column in Show.__table__.columns],
+}
+
+
+# ----------------------------------------------------------------------------#
+# Encoders.
+# ----------------------------------------------------------------------------#
+
+# Both yield text chunks of up to `chunk` records, to keep the number of
+# writes (or HTTP chunks) low.
+
+def ndjson_chunks(kind, chunk=1000):
+    lines = list()
+    for record in EXPORTS[kind]():
+        line = dumps(record)
+        lines.append(line.decode() if isinstance(line, bytes) else line)
+        if len(lines) >= chunk:
+            yield "\n".join(lines) + "\n"
+            lines = list()
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ";".join(value)
+    return value
+
+
+def csv_chunks(kind, chunk=1000):
+    columns = COLUMNS[kind]()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for i, record in enumerate(EXPORTS[kind](), 1):
+        writer.writerow([csv_value(record[column]) for column in columns])
+        if i % chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+FORMATS = {
+    "ndjson": (ndjson_chunks, "application/x-ndjson"),
+    "csv": (csv_chunks, "text/csv"),
+}
+
+
+# ----------------------------------------------------------------------------#
+# Endpoints.
+# ----------------------------------------------------------------------------#
+
+@export.route("/<kind>.<format>")
+def export_catalog(kind, format):
+    # a full scan per request, unauthenticated: opt-in
+    if not current_app.config["EXPORT_HTTP"]:
+        abort(404)
+    if kind not in EXPORTS or format not in FORMATS:
+        abort(404)
+    chunks, mimetype = FORMATS[format]
+    return Response(stream_with_context(chunks(kind)), mimetype=mimetype,
+                    headers={"Content-Disposition":
+                             f"attachment; filename={kind}.{format}"})
+
+
+@export.cli.command("export")
+@click.argument("kind", type=click.Choice(sorted(EXPORTS)))
+@click.option("--format", "format", type=click.Choice(sorted(FORMATS)),
+              default="ndjson", show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False),
+              help="File to write to, instead of stdout.")
+def export_command(kind, format, output):
+    """Export all venues, artists or shows as NDJSON or CSV."""
+    chunks, mimetype = FORMATS[format]
+    out = open(output, "w", newline="") if output else sys.stdout
+    try:
+        for text in chunks(kind):
+            out.write(text)
+    finally:
+        if output:
+            out.close()
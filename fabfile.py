@@ -6,13 +6,25 @@ from fabric.contrib.console import confirm
 
 def test():
     with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
+        result = local("python -m pytest --benchmark-skip", capture=True)
+        if not result.failed:
+            # queries per request and latency of every route, the medians
+            # against the run saved by baseline(), see tests/test_benchmarks.py
+            result = local(
+                "python -m pytest tests/test_benchmarks.py --benchmark-only "
+                "--benchmark-compare --benchmark-compare-fail=median:25%",
+                capture=True
+            )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
 
+def baseline():
+    # the route timings test() compares with, e.g. after a release
+    local("python -m pytest tests/test_benchmarks.py --benchmark-only "
+          "--benchmark-autosave")
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -2,8 +2,11 @@ import re
 from datetime import datetime
 from flask_wtf import FlaskForm
 from wtforms import StringField, SelectField, SelectMultipleField, \
-    DateTimeField, ValidationError
-from wtforms.validators import DataRequired, AnyOf, URL, Optional
+    DateTimeField, IntegerField, ValidationError
+from wtforms.validators import DataRequired, AnyOf, URL, Optional, \
+    NumberRange
+
+from models import SHOW_DURATION, MAX_SHOW_DURATION
 
 
 class ShowForm(FlaskForm):
@@ -18,6 +21,12 @@ class ShowForm(FlaskForm):
         validators=[DataRequired()],
         default=datetime.today()
     )
+    # minutes
+    duration = IntegerField(
+        'duration',
+        validators=[Optional(), NumberRange(min=1, max=MAX_SHOW_DURATION)],
+        default=SHOW_DURATION
+    )
 
 
 class VenueForm(FlaskForm):
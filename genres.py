@@ -0,0 +1,116 @@
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import db, Genre
+
+
+# ----------------------------------------------------------------------------#
+# Genre cache.
+# ----------------------------------------------------------------------------#
+
+# The genre table is tiny and almost never written, yet every venue and
+# artist form resolves the submitted genre names into Genre objects. A
+# process-wide name -> id map, warmed on the first request and cleared
+# whenever a commit touches a Genre, turns that into a dict lookup. Names
+# missing from the map (e.g. added by another worker) are fetched with a
+# single IN query and cached.
+
+class GenreCache(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = dict()
+        self.warm = False
+
+    def warm_up(self):
+        ids = dict(db.session.query(Genre.name, Genre.id))
+        with self.lock:
+            self.ids = ids
+            self.warm = True
+
+    def clear(self):
+        with self.lock:
+            self.ids = dict()
+            self.warm = False
+
+    def lookup(self, names):
+        """Return a name -> id dict for the known names among names."""
+        if not self.warm:
+            self.warm_up()
+        with self.lock:
+            found = {name: self.ids[name] for name in names
+                     if name in self.ids}
+        missing = [name for name in names if name not in found]
+        if missing:
+            fetched = dict(db.session.query(Genre.name, Genre.id)
+                           .filter(Genre.name.in_(missing)))
+            with self.lock:
+                self.ids.update(fetched)
+            found.update(fetched)
+        return found
+
+
+genre_cache = GenreCache()
+
+
+def resolve_genres(names):
+    """Given a list of genre names, return the matching Genre objects,
+    attached to the session without querying the database, and the names
+    that match no genre. Returns a tuple:
+    (genres, unknown) = ([<Genre>, ...], ["Unknown name", ...])
+    """
+    ids = genre_cache.lookup(names)
+    genres = list()
+    for name in names:
+        if name in ids:
+            genre = Genre(id=ids[name], name=name)
+            # mark it as an existing row, then merge(load=False) puts it in
+            # the identity map as is, instead of SELECTing it again
+            make_transient_to_detached(genre)
+            genres.append(db.session.merge(genre, load=False))
+    unknown = [name for name in names if name not in ids]
+    return genres, unknown
+
+
+# ----------------------------------------------------------------------------#
+# Invalidation.
+# ----------------------------------------------------------------------------#
+
+def collect_genre_changes(session, flush_context):
+    """after_flush: note whether the flush wrote any Genre row. Linking a
+    genre to a venue or artist only touches its backref collection, which
+    leaves the genre table (and the cache) unchanged."""
+    changed = [instance for instance in session.new | session.deleted
+               if isinstance(instance, Genre)]
+    changed += [instance for instance in session.dirty
+                if isinstance(instance, Genre) and
+                session.is_modified(instance, include_collections=False)]
+    if changed:
+        session.info["genres_changed"] = True
+
+
+def clear_genre_cache(session):
+    """after_commit: drop the cache if the transaction wrote a Genre."""
+    if session.info.pop("genres_changed", False):
+        genre_cache.clear()
+
+
+def discard_genre_changes(session):
+    """after_rollback: nothing was written."""
+    session.info.pop("genres_changed", None)
+
+
+def init_app(app):
+    """Warm the cache on the first request and keep it in sync."""
+
+    @app.before_first_request
+    def warm_genre_cache():
+        genre_cache.warm_up()
+
+    # db.session is shared by every app: listen once
+    if not event.contains(db.session, "after_flush", collect_genre_changes):
+        event.listen(db.session, "after_flush", collect_genre_changes)
+        event.listen(db.session, "after_commit", clear_genre_cache)
+        event.listen(db.session, "after_rollback", discard_genre_changes)
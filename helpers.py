@@ -0,0 +1,44 @@
+from datetime import datetime
+
+
+# ----------------------------------------------------------------------------#
+# View helpers.
+# ----------------------------------------------------------------------------#
+
+def to_dict(instance):
+    """Given a Venue or Artist object, return its column values as a plain
+    dict, leaving the object (and the session identity map) untouched."""
+    return {column.key: getattr(instance, column.key)
+            for column in instance.__table__.columns}
+
+
+def split_shows(shows, now=None):
+    """Given show rows ordered by start_time, each having a start_time
+    and the artist_* or venue_* columns to display, partition them in a
+    single pass: a show is upcoming if it starts after now, past otherwise.
+    Returns a dict:
+    shows = {
+        "past_shows": [
+            ...
+            ],
+        "upcoming_shows": [],
+        "past_shows_count": 0,
+        "upcoming_shows_count": 0
+        }
+    """
+    if now is None:
+        now = datetime.now()
+    past_shows = list()
+    upcoming_shows = list()
+    for row in shows:
+        show = row._asdict()
+        if row.start_time > now:
+            upcoming_shows.append(show)
+        else:
+            past_shows.append(show)
+    return {
+        "past_shows": past_shows,
+        "upcoming_shows": upcoming_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows)
+    }
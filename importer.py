@@ -0,0 +1,459 @@
+import csv
+import io
+import json
+import re
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from werkzeug.datastructures import MultiDict
+
+from bookings import Bookings
+from cache import invalidate, warn_unshared, CATALOG_TAG
+from counters import count, new_deltas, shift_counts
+from forms import VenueForm, ArtistForm, ShowForm
+from genres import genre_cache
+from models import db, Venue, Artist, Show, venue_genre, artist_genre, \
+    SHOW_DURATION
+from search import touch_stamp
+
+
+# ----------------------------------------------------------------------------#
+# Readers.
+# ----------------------------------------------------------------------------#
+
+# Both yield (line number, MultiDict) pairs of the values as written.
+# Genres are a list in NDJSON and ";" separated in CSV, as in the export.
+# The values of `flask export` are stored values, not form input: they are
+# turned back into what the forms accept (see from_export), unless they are
+# trusted (see below).
+
+BOOLEANS = {"true": "Yes", "1": "Yes", "false": "No", "0": "No", "": "No"}
+
+
+def from_export(data):
+    """Form input for the exported values of data (a MultiDict, changed in
+    place): a phone stored as 10 digits is formatted xxx-xxx-xxxx, the
+    seeking_* booleans become "Yes"/"No" and an ISO 8601 start_time (with
+    a "T") is formatted like the form's. Form input is left as is."""
+    phone = data.get("phone", "").strip()
+    if re.fullmatch(r"\d{10}", phone):
+        data["phone"] = f"{phone[:3]}-{phone[3:6]}-{phone[6:]}"
+    for field in ("seeking_talent", "seeking_venue"):
+        value = data.get(field)
+        if value is not None and value.strip().lower() in BOOLEANS:
+            data[field] = BOOLEANS[value.strip().lower()]
+    start_time = data.get("start_time", "").strip()
+    if "T" in start_time:
+        try:
+            data["start_time"] = datetime.fromisoformat(start_time)\
+                .strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass  # left to the form to reject
+    return data
+
+
+def read_csv(f):
+    for line, row in enumerate(csv.DictReader(f), 2):
+        data = MultiDict(row)
+        if "genres" in row:
+            data.setlist("genres", [name for name in
+                                    (row["genres"] or "").split(";") if name])
+        yield line, data
+
+
+def read_ndjson(f):
+    for line, text in enumerate(f, 1):
+        if not text.strip():
+            continue
+        data = MultiDict()
+        for key, value in json.loads(text).items():
+            if isinstance(value, list):
+                data.setlist(key, [str(item) for item in value])
+            elif value is not None:
+                data[key] = str(value)
+        yield line, data
+
+
+READERS = {
+    "csv": read_csv,
+    "ndjson": read_ndjson,
+}
+
+
+# ----------------------------------------------------------------------------#
+# Validation.
+# ----------------------------------------------------------------------------#
+
+# Rows go through the same forms, hence the same rules (phone format, state
+# and genre choices, URLs...), and are normalized like the create handlers
+# of app.py do. A record builder returns the column values of the row.
+
+def venue_record(form):
+    return {
+        "name": form.name.data.strip(),
+        "city": form.city.data.strip(),
+        "state": form.state.data,
+        "address": form.address.data.strip(),
+        # strip non-digits
+        "phone": re.sub(r"\D", "", form.phone.data.strip()),
+        "seeking_talent": form.seeking_talent.data == "Yes",
+        "seeking_description": form.seeking_description.data.strip(),
+        "image_link": form.image_link.data.strip(),
+        "website": form.website.data.strip(),
+        "facebook_link": form.facebook_link.data.strip(),
+    }
+
+
+def artist_record(form):
+    return {
+        "name": form.name.data.strip(),
+        "city": form.city.data.strip(),
+        "state": form.state.data,
+        # strip non-digits
+        "phone": re.sub(r"\D", "", form.phone.data.strip()),
+        "seeking_venue": form.seeking_venue.data == "Yes",
+        "seeking_description": form.seeking_description.data.strip(),
+        "image_link": form.image_link.data.strip(),
+        "website": form.website.data.strip(),
+        "facebook_link": form.facebook_link.data.strip(),
+    }
+
+
+def show_record(form):
+    return {
+        "artist_id": int(form.artist_id.data.strip()),
+        "venue_id": int(form.venue_id.data.strip()),
+        "start_time": form.start_time.data,
+        "duration": form.duration.data or SHOW_DURATION,
+    }
+
+
+def row_id(data):
+    """The id of a row, None if it has none. Raises ValueError."""
+    id = (data.get("id") or "").strip()
+    if not id:
+        return None
+    try:
+        return int(id)
+    except ValueError:
+        raise ValueError("id: must be an integer")
+
+
+def validate(form_class, record, data):
+    """Return (record, genre names) for a valid row, or raise ValueError
+    with the first validation error."""
+    form = form_class(from_export(data), meta={"csrf": False})
+    if not form.validate():
+        field, errors = next(iter(form.errors.items()))
+        raise ValueError(f"{field}: {errors[0]}")
+    try:
+        values = record(form)
+    except ValueError:
+        raise ValueError("artist_id and venue_id must be integers")
+    genres = form.genres.data if hasattr(form, "genres") else []
+    return values, genres
+
+
+# The rows of `flask import --trusted` were written by `flask export` from
+# a Fyyur database, hence validated by the forms once already: their stored
+# values are only parsed, which costs a fraction of building a form. The
+# checks against the target database (ids, genres, venues and artists of
+# the shows, double bookings) still apply.
+
+def boolean(value):
+    value = value.strip().lower()
+    if value not in BOOLEANS:
+        raise ValueError
+    return BOOLEANS[value] == "Yes"
+
+
+def text(value):
+    return value
+
+
+ENTITY_COLUMNS = {
+    "name": text,
+    "city": text,
+    "state": text,
+    "phone": text,
+    "seeking_description": text,
+    "image_link": text,
+    "website": text,
+    "facebook_link": text,
+}
+
+EXPORTED_COLUMNS = {
+    "venues": dict(ENTITY_COLUMNS, address=text, seeking_talent=boolean),
+    "artists": dict(ENTITY_COLUMNS, seeking_venue=boolean),
+    "shows": {
+        "artist_id": int,
+        "venue_id": int,
+        "start_time": datetime.fromisoformat,
+        "duration": int,
+    },
+}
+
+
+def parse_exported(kind, data):
+    """Return (record, genre names) for an exported row, or raise
+    ValueError naming the first column which does not parse. A missing
+    text column is NULL, as exported."""
+    values = dict()
+    for column, parse in EXPORTED_COLUMNS[kind].items():
+        value = data.get(column)
+        if value is None and parse is text:
+            values[column] = None
+            continue
+        try:
+            values[column] = parse(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{column}: invalid value {value!r}")
+    return values, data.getlist("genres")
+
+
+# ----------------------------------------------------------------------------#
+# Bulk insertion.
+# ----------------------------------------------------------------------------#
+
+def reserve_ids(table, count, after=0):
+    """Allocate count primary keys up front, so that the association rows
+    can be written without reading the ids back, all above after (the
+    largest id kept by the batch). On PostgreSQL they come from the table
+    sequence; elsewhere (SQLite) they follow the current maximum, which
+    assumes no concurrent writer during the import."""
+    if db.engine.dialect.name == "postgresql":
+        if after:
+            # past the kept ids, without ever moving the sequence back
+            db.session.execute(
+                f"SELECT setval('{table.name}_id_seq', "
+                f"greatest(:after, nextval('{table.name}_id_seq')))",
+                {"after": after})
+        return [id for id, in db.session.execute(
+            f"SELECT nextval('{table.name}_id_seq') "
+            f"FROM generate_series(1, :count)", {"count": count})]
+    start = max(after, db.session.execute(
+        db.select([db.func.coalesce(db.func.max(table.c.id), 0)])).scalar())
+    return list(range(start + 1, start + count + 1))
+
+
+def assign_ids(table, ids):
+    """The primary keys of a batch of rows, given their kept ids: those,
+    and reserved ones for the rows without (None)."""
+    kept = [id for id in ids if id is not None]
+    fresh = iter(reserve_ids(table, len(ids) - len(kept),
+                             max(kept, default=0)))
+    return [next(fresh) if id is None else id for id in ids]
+
+
+def bulk_insert(table, rows):
+    """Insert rows (dicts with the same keys) with COPY on PostgreSQL, one
+    executemany elsewhere."""
+    if not rows:
+        return
+    columns = list(rows[0])
+    if db.engine.dialect.name != "postgresql":
+        db.session.execute(table.insert(), rows)
+        return
+    buffer = io.StringIO()
+    # non numeric values quoted, so that "" (empty) and None (NULL) differ
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(f'COPY "{table.name}" ({", ".join(columns)}) '
+                       f'FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def insert_entities(model, association, foreign_key, rows, genre_ids):
+    """Insert a batch of venues or artists, given as (record, genre names)
+    pairs, and their genre links."""
+    if not rows:
+        return
+    ids = assign_ids(model.__table__,
+                     [record.get("id") for record, names in rows])
+    records = list()
+    links = list()
+    for id, (record, names) in zip(ids, rows):
+        records.append(dict(record, id=id, updated_at=datetime.utcnow()))
+        links += [{foreign_key: id, "genre_id": genre_ids[name]}
+                  for name in names]
+    bulk_insert(model.__table__, records)
+    bulk_insert(association, links)
+
+
+def insert_shows(records):
+    """Insert a batch of shows, count them in the counters of their venues
+    and artists (see counters.py), and bump the versions of the pages they
+    appear on (see models.touch_related_pages)."""
+    if not records:
+        return
+    now = datetime.now()
+    ids = assign_ids(Show.__table__, [record.get("id") for record in records])
+    records = [dict(record, id=id, upcoming=record["start_time"] > now,
+                    updated_at=datetime.utcnow())
+               for id, record in zip(ids, records)]
+    bulk_insert(Show.__table__, records)
+    venues, artists = new_deltas(), new_deltas()
+    for record in records:
+        count(venues, artists, record["venue_id"], record["artist_id"],
+              record["upcoming"], 1)
+    shift_counts(db.session, Venue, venues)
+    shift_counts(db.session, Artist, artists)
+    for model, key in ((Venue, "venue_id"), (Artist, "artist_id")):
+        ids = {record[key] for record in records}
+        db.session.execute(model.__table__.update()
+                           .where(model.id.in_(ids))
+                           .values(updated_at=datetime.utcnow()))
+
+
+def existing_ids(model, ids):
+    return {id for id, in db.session.query(model.id)
+            .filter(model.id.in_(ids))}
+
+
+# ----------------------------------------------------------------------------#
+# Command.
+# ----------------------------------------------------------------------------#
+
+IMPORTS = {
+    "venues": (Venue, VenueForm, venue_record),
+    "artists": (Artist, ArtistForm, artist_record),
+    "shows": (Show, ShowForm, show_record),
+}
+
+
+def import_batch(kind, batch, report, keep_ids=False, trusted=False):
+    """Validate a batch of (line, data) rows and insert the valid ones in
+    one transaction. With keep_ids, rows keep their id column, so that the
+    shows of an export still refer to the venues and artists imported
+    before them; a row whose id is taken is rejected. trusted rows, from
+    `flask export`, are parsed instead of going through the forms. Returns
+    the number of rows inserted."""
+    model, form_class, record = IMPORTS[kind]
+    records = list()
+    genres = list()
+    lines = list()
+    for line, data in batch:
+        try:
+            if trusted:
+                values, names = parse_exported(kind, data)
+            else:
+                values, names = validate(form_class, record, data)
+            if keep_ids:
+                values["id"] = row_id(data)
+        except ValueError as e:
+            report(line, str(e))
+            continue
+        records.append(values)
+        genres.append(names)
+        lines.append(line)
+
+    if keep_ids:
+        taken = existing_ids(model, {values["id"] for values in records
+                                     if values["id"] is not None})
+        kept = list()
+        for line, values, names in zip(lines, records, genres):
+            if values["id"] in taken:
+                report(line, f"id: {model.__tablename__} {values['id']} "
+                             f"already exists")
+                continue
+            if values["id"] is not None:
+                taken.add(values["id"])
+            kept.append((line, values, names))
+        lines, records, genres = [[row[i] for row in kept] for i in range(3)]
+
+    if kind == "shows":
+        venues = existing_ids(Venue, {r["venue_id"] for r in records})
+        artists = existing_ids(Artist, {r["artist_id"] for r in records})
+        # double bookings, against the database and within the batch
+        bookings = Bookings(records)
+        valid = list()
+        for line, values in zip(lines, records):
+            if values["venue_id"] not in venues:
+                report(line, f"venue_id: no venue {values['venue_id']}")
+            elif values["artist_id"] not in artists:
+                report(line, f"artist_id: no artist {values['artist_id']}")
+            else:
+                error = bookings.book(values)
+                if error:
+                    report(line, error)
+                else:
+                    valid.append(values)
+        records = valid
+        insert_shows(records)
+    else:
+        # one lookup (at most one IN query) for the genres of the batch
+        genre_ids = genre_cache.lookup(
+            sorted({name for names in genres for name in names}))
+        valid = list()
+        for line, values, names in zip(lines, records, genres):
+            unknown = [name for name in names if name not in genre_ids]
+            if unknown:
+                report(line, f"genres: unknown genre {', '.join(unknown)}")
+            else:
+                valid.append((values, names))
+        records = [values for values, names in valid]
+        if kind == "venues":
+            insert_entities(Venue, venue_genre, "venue_id", valid, genre_ids)
+        else:
+            insert_entities(Artist, artist_genre, "artist_id", valid,
+                            genre_ids)
+    db.session.commit()
+    return len(records)
+
+
+def init_app(app):
+    """Register the `flask import` command."""
+
+    @app.cli.command("import")
+    @click.argument("kind", type=click.Choice(sorted(IMPORTS)))
+    @click.argument("file", type=click.File("r", encoding="utf-8"))
+    @click.option("--format", "format", type=click.Choice(sorted(READERS)),
+                  help="Defaults to the extension of FILE.")
+    @click.option("--batch-size", default=app.config["IMPORT_BATCH_SIZE"],
+                  show_default=True, help="Rows inserted per transaction.")
+    @click.option("--trusted", is_flag=True,
+                  help="FILE was written by `flask export`: parse its "
+                       "values instead of validating them like the forms.")
+    def import_command(kind, file, format, batch_size, trusted):
+        """Bulk import venues, artists or shows from a CSV or NDJSON FILE,
+        validated like the create forms. Files written by `flask export`
+        are read as is, and their ids are kept."""
+        warn_unshared()
+        if format is None:
+            format = "csv" if file.name.endswith(".csv") else "ndjson"
+        rejected = list()
+
+        def report(line, error):
+            rejected.append(line)
+            if len(rejected) <= 20:
+                click.echo(f"line {line}: {error}", err=True)
+
+        started = time.perf_counter()
+        imported = 0
+        batch = list()
+        rows = READERS[format](file)
+        while True:
+            row = next(rows, None)
+            if row is not None:
+                batch.append(row)
+            if batch and (row is None or len(batch) >= batch_size):
+                imported += import_batch(kind, batch, report,
+                                         keep_ids=True, trusted=trusted)
+                batch = list()
+                rate = imported / (time.perf_counter() - started)
+                click.echo(f"{kind}: {imported} imported, {len(rejected)} "
+                           f"rejected ({rate:.0f} rows/s)")
+            if row is None:
+                break
+
+        # the rows bypassed the session events: drop every cached page and
+        # have the workers rebuild their name index
+        invalidate(CATALOG_TAG)
+        touch_stamp(current_app.config["SEARCH_INDEX_STAMP"])
+        if len(rejected) > 20:
+            click.echo(f"... {len(rejected) - 20} more rejected rows",
+                       err=True)
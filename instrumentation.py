@@ -0,0 +1,212 @@
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask.signals import before_render_template, signals_available, \
+    template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# ----------------------------------------------------------------------------#
+# Per request measures.
+# ----------------------------------------------------------------------------#
+
+# Every statement run while handling a request is counted and timed, as is
+# the template rendering (through Flask's blinker signals). The measures
+# live in g, so statements run outside a request (CLI commands) are
+# ignored.
+
+class RequestTimings(object):
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.render_time = 0.0
+        self.render_started = None
+
+
+def timings():
+    if has_request_context():
+        return g.get("timings")
+    return None
+
+
+# The start time of a statement is kept on its execution context, which
+# ends with it whether it succeeds or fails; a failed statement is counted
+# too (handle_error).
+
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    context.query_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context,
+                         executemany):
+    record_statement(context, statement)
+
+
+def handle_error(exception_context):
+    context = exception_context.execution_context
+    if context is not None and hasattr(context, "query_started"):
+        record_statement(context, exception_context.statement)
+
+
+def record_statement(context, statement):
+    elapsed = time.perf_counter() - context.query_started
+    request_timings = timings()
+    if request_timings is None:
+        return
+    request_timings.statements += 1
+    request_timings.db_time += elapsed
+    if elapsed >= request_timings.slowest_time:
+        request_timings.slowest_time = elapsed
+        request_timings.slowest_statement = statement
+
+
+def render_started(sender, template, context, **extra):
+    request_timings = timings()
+    if request_timings is not None:
+        request_timings.render_started = time.perf_counter()
+
+
+def render_finished(sender, template, context, **extra):
+    request_timings = timings()
+    if request_timings is not None and \
+            request_timings.render_started is not None:
+        request_timings.render_time += \
+            time.perf_counter() - request_timings.render_started
+        request_timings.render_started = None
+
+
+# ----------------------------------------------------------------------------#
+# Per endpoint totals.
+# ----------------------------------------------------------------------------#
+
+class EndpointMetrics(object):
+    """Totals of the request measures by endpoint, for this process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = dict()
+
+    def record(self, endpoint, duration, request_timings):
+        with self.lock:
+            totals = self.endpoints.setdefault(endpoint, {
+                "requests": 0,
+                "statements": 0,
+                "db_seconds": 0.0,
+                "render_seconds": 0.0,
+                "request_seconds": 0.0,
+                "max_statements": 0,
+                "slowest_statement_seconds": 0.0,
+            })
+            totals["requests"] += 1
+            totals["statements"] += request_timings.statements
+            totals["db_seconds"] += request_timings.db_time
+            totals["render_seconds"] += request_timings.render_time
+            totals["request_seconds"] += duration
+            totals["max_statements"] = max(totals["max_statements"],
+                                           request_timings.statements)
+            totals["slowest_statement_seconds"] = max(
+                totals["slowest_statement_seconds"],
+                request_timings.slowest_time)
+
+    def snapshot(self):
+        with self.lock:
+            return {endpoint: dict(totals)
+                    for endpoint, totals in self.endpoints.items()}
+
+
+endpoint_metrics = EndpointMetrics()
+
+# (name, type, help) of the exported series, named after the totals keys
+METRICS = [
+    ("requests", "counter", "Requests served."),
+    ("statements", "counter", "SQL statements executed."),
+    ("db_seconds", "counter", "Time spent executing SQL statements."),
+    ("render_seconds", "counter", "Time spent rendering templates."),
+    ("request_seconds", "counter", "Time spent handling requests."),
+    ("max_statements", "gauge", "Most SQL statements run by one request."),
+    ("slowest_statement_seconds", "gauge", "Slowest SQL statement."),
+]
+
+
+def prometheus_text(snapshot, prefix="fyyur"):
+    """The totals in the Prometheus text exposition format."""
+    lines = list()
+    for key, kind, help in METRICS:
+        name = f"{prefix}_{key}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for endpoint, totals in sorted(snapshot.items()):
+            lines.append(f'{name}{{endpoint="{endpoint}"}} {totals[key]:g}')
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------------------------------------------#
+# Request hooks.
+# ----------------------------------------------------------------------------#
+
+def start_timings():
+    g.timings = RequestTimings()
+
+
+def report_timings(response):
+    request_timings = g.pop("timings", None)
+    if request_timings is None:
+        return response
+    duration = time.perf_counter() - request_timings.started
+    endpoint = request.endpoint or "unknown"
+    endpoint_metrics.record(endpoint, duration, request_timings)
+
+    response.headers["Server-Timing"] = ", ".join([
+        f'db;dur={1000 * request_timings.db_time:.1f};'
+        f'desc="{request_timings.statements} queries"',
+        f"render;dur={1000 * request_timings.render_time:.1f}",
+        f"total;dur={1000 * duration:.1f}",
+    ])
+
+    config = current_app.config
+    if 1000 * duration >= config["INSTRUMENTATION_SLOW_REQUEST_MS"] or \
+            request_timings.statements >= \
+            config["INSTRUMENTATION_MAX_STATEMENTS"]:
+        current_app.logger.warning(
+            "%s %s: %.1f ms, %d statements (%.1f ms), render %.1f ms, "
+            "slowest statement %.1f ms: %s", request.method,
+            request.full_path.rstrip("?"), 1000 * duration,
+            request_timings.statements,
+            1000 * request_timings.db_time,
+            1000 * request_timings.render_time,
+            1000 * request_timings.slowest_time,
+            " ".join((request_timings.slowest_statement or "").split())[:200])
+    return response
+
+
+def metrics():
+    return current_app.response_class(
+        prometheus_text(endpoint_metrics.snapshot()),
+        mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    """When INSTRUMENTATION_ENABLED, measure every request, add the
+    Server-Timing header, log the slow ones and serve the totals at
+    /internal/metrics."""
+    if not app.config["INSTRUMENTATION_ENABLED"]:
+        return
+    # listeners of the Engine class apply to every app: listen once
+    if not event.contains(Engine, "before_cursor_execute",
+                          before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(Engine, "handle_error", handle_error)
+    if signals_available:
+        before_render_template.connect(render_started, app)
+        template_rendered.connect(render_finished, app)
+    app.before_request(start_timings)
+    app.after_request(report_timings)
+    app.add_url_rule("/internal/metrics", "metrics", metrics)
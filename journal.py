@@ -0,0 +1,307 @@
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+
+import click
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, \
+    request, url_for
+
+from cache import invalidate, shared, show_tags
+
+
+journal = Blueprint("journal", __name__, url_prefix="/journal")
+
+
+# ----------------------------------------------------------------------------#
+# Journal.
+# ----------------------------------------------------------------------------#
+
+# Write-behind mode (WRITE_BEHIND): the create forms validate a submission,
+# append it to a SQLite journal on the local disk and answer at once; the
+# database write is left to `flask journal-worker`, which inserts the
+# journaled rows in batches of WRITE_BEHIND_BATCH_SIZE per transaction.
+# An entry goes from queued to flushing (claimed by a worker) to done,
+# rejected (invalid by the time it was flushed, e.g. its venue was deleted)
+# or, after WRITE_BEHIND_MAX_ATTEMPTS failed transactions, failed. A batch
+# claimed by a worker which died is claimed again after WRITE_BEHIND_LEASE
+# seconds: entries are inserted at least once. The worker invalidates the
+# cached pages of the rows it inserts, which only reaches the web workers
+# through a shared cache backend: write-behind mode refuses "lru".
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entry (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    due_at REAL NOT NULL,
+    claim TEXT,
+    claimed_at REAL,
+    done_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_entry_state_due_at ON entry (state, due_at);
+"""
+
+STATES = ("queued", "flushing", "done", "rejected", "failed")
+
+
+class Journal(object):
+    """The journal file at path. A connection is opened per operation: the
+    web workers and the journal worker are separate processes."""
+
+    def __init__(self, path):
+        self.path = path
+        with closing(self.connect()) as connection:
+            # WAL: appends do not wait for a worker reading the journal
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    def connect(self):
+        # autocommit, transactions are begun explicitly
+        connection = sqlite3.connect(self.path, timeout=30,
+                                     isolation_level=None)
+        # an accepted submission survives a power loss
+        connection.execute("PRAGMA synchronous=FULL")
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def append(self, kind, data):
+        """Journal the form data (a list of (field, value) pairs) of a kind
+        ("venues", "artists" or "shows") submission. Returns its key."""
+        key = uuid.uuid4().hex
+        now = time.time()
+        with closing(self.connect()) as connection:
+            connection.execute(
+                "INSERT INTO entry (key, kind, data, created_at, due_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, kind, json.dumps(data), now, now))
+        return key
+
+    def status(self, key):
+        with closing(self.connect()) as connection:
+            return connection.execute(
+                "SELECT kind, state, attempts, error, created_at, done_at "
+                "FROM entry WHERE key = ?", (key,)).fetchone()
+
+    def summary(self):
+        """Returns a dict: the number of entries in each state, and the age
+        in seconds of the oldest queued one (0 if none)."""
+        with closing(self.connect()) as connection:
+            counts = dict(connection.execute(
+                "SELECT state, count(*) FROM entry GROUP BY state"))
+            oldest = connection.execute(
+                "SELECT min(created_at) FROM entry "
+                "WHERE state IN ('queued', 'flushing')").fetchone()[0]
+        summary = {state: counts.get(state, 0) for state in STATES}
+        summary["oldest_queued_s"] = \
+            round(time.time() - oldest, 1) if oldest else 0
+        return summary
+
+    def claim(self, limit, lease):
+        """Take up to limit entries due for a flush, oldest first."""
+        claim = uuid.uuid4().hex
+        now = time.time()
+        with closing(self.connect()) as connection:
+            # IMMEDIATE: two workers never claim the same entries
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "UPDATE entry SET state = 'flushing', claim = ?, "
+                "claimed_at = ? WHERE id IN (SELECT id FROM entry "
+                "WHERE (state = 'queued' AND due_at <= ?) "
+                "OR (state = 'flushing' AND claimed_at <= ?) "
+                "ORDER BY id LIMIT ?)",
+                (claim, now, now, now - lease, limit))
+            entries = connection.execute(
+                "SELECT id, kind, data, attempts FROM entry "
+                "WHERE claim = ? ORDER BY id", (claim,)).fetchall()
+            connection.execute("COMMIT")
+        return entries
+
+    def finish(self, entries, results, max_attempts):
+        """Record the results of a flush of entries, a dict {id: (result,
+        error)} where result is "done", "rejected" or "retry". Retried
+        entries are due again after an exponential backoff."""
+        now = time.time()
+        attempts = {entry["id"]: entry["attempts"] for entry in entries}
+        finished = list()
+        retried = list()
+        for id, (result, error) in results.items():
+            if result != "retry":
+                finished.append((result, error, now, id))
+            elif attempts[id] + 1 >= max_attempts:
+                finished.append(("failed", error, now, id))
+            else:
+                retried.append((error, now + 2 ** attempts[id], id))
+        with closing(self.connect()) as connection:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "UPDATE entry SET state = ?, error = ?, done_at = ?, "
+                "attempts = attempts + 1, claim = NULL WHERE id = ?",
+                finished)
+            connection.executemany(
+                "UPDATE entry SET state = 'queued', error = ?, due_at = ?, "
+                "attempts = attempts + 1, claim = NULL WHERE id = ?",
+                retried)
+            connection.execute("COMMIT")
+
+    def prune(self, retention):
+        """Forget the entries finished more than retention seconds ago."""
+        with closing(self.connect()) as connection:
+            connection.execute(
+                "DELETE FROM entry WHERE state IN ('done', 'rejected') "
+                "AND done_at < ?", (time.time() - retention,))
+
+
+def accepted(kind, what):
+    """Response of a create view in write-behind mode, for a valid
+    submission: journal the request form and redirect home at once. The
+    X-Journal-Entry header gives the URL of its status, for the clients
+    which need to know when it is in the database."""
+    key = current_app.extensions["journal"].append(
+        kind, list(request.form.items(multi=True)))
+    flash(f"{what} was received and will be listed shortly.")
+    response = redirect(url_for('index'))
+    response.headers["X-Journal-Entry"] = url_for("journal.status", key=key)
+    return response
+
+
+# ----------------------------------------------------------------------------#
+# Worker.
+# ----------------------------------------------------------------------------#
+
+def flush_batch(kind, entries):
+    """Insert entries of kind in one transaction, with the bulk import
+    code: they are validated again, against the current database. If the
+    transaction fails, each entry is tried in its own, so that one bad
+    entry does not hold back the others. Returns a dict {id: (result,
+    error)}."""
+    from sqlalchemy.exc import SQLAlchemyError
+    from werkzeug.datastructures import MultiDict
+    from importer import import_batch
+    from models import db
+
+    results = {entry["id"]: ("done", None) for entry in entries}
+
+    def report(id, error):
+        results[id] = ("rejected", error)
+
+    try:
+        import_batch(kind, [(entry["id"],
+                             MultiDict(json.loads(entry["data"])))
+                            for entry in entries], report)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        if len(entries) == 1:
+            # the driver's message, without the statement and its values
+            return {entries[0]["id"]: ("retry",
+                                       str(getattr(e, "orig", None) or e))}
+        results = dict()
+        for entry in entries:
+            results.update(flush_batch(kind, [entry]))
+    return results
+
+
+def written_tags(kind, entries):
+    """Cache tags of the pages changed by the inserted entries (see
+    cache.collect_new)."""
+    if kind != "shows":
+        return {kind}
+    tags = set()
+    for entry in entries:
+        data = dict(json.loads(entry["data"]))
+        tags |= show_tags(data.get("venue_id", "").strip(),
+                          data.get("artist_id", "").strip())
+    return tags
+
+
+def flush(journal, config):
+    """Claim a batch of entries and insert them. Returns the number of
+    entries claimed."""
+    from search import touch_stamp
+
+    entries = journal.claim(config["WRITE_BEHIND_BATCH_SIZE"],
+                            config["WRITE_BEHIND_LEASE"])
+    results = dict()
+    tags = set()
+    named = False
+    # venues and artists first, which shows may refer to
+    for kind in ("venues", "artists", "shows"):
+        batch = [entry for entry in entries if entry["kind"] == kind]
+        if not batch:
+            continue
+        outcome = flush_batch(kind, batch)
+        results.update(outcome)
+        done = [entry for entry in batch if outcome[entry["id"]][0] == "done"]
+        if done:
+            tags |= written_tags(kind, done)
+            named = named or kind != "shows"
+    journal.finish(entries, results, config["WRITE_BEHIND_MAX_ATTEMPTS"])
+    # the rows were inserted without the session events (see importer.py)
+    if tags:
+        invalidate(*tags)
+    if named:
+        # new names for the search index of every web worker
+        touch_stamp(config["SEARCH_INDEX_STAMP"])
+    return len(entries)
+
+
+# ----------------------------------------------------------------------------#
+# Endpoints.
+# ----------------------------------------------------------------------------#
+
+@journal.route("")
+def summary():
+    return jsonify(current_app.extensions["journal"].summary())
+
+
+@journal.route("/<key>")
+def status(key):
+    """The state of a journaled submission: "queued" and "flushing" mean
+    accepted, not yet in the database."""
+    entry = current_app.extensions["journal"].status(key)
+    if entry is None:
+        abort(404)
+    return jsonify(dict(entry))
+
+
+def init_app(app):
+    """In write-behind mode, check the cache backend, open the journal and
+    register its endpoints. Register the worker command."""
+    if app.config["WRITE_BEHIND"]:
+        if not shared(app.config):
+            raise RuntimeError("WRITE_BEHIND needs CACHE_TYPE \"filesystem\" "
+                               "or \"null\": the journal worker cannot "
+                               "invalidate the \"lru\" caches of the web "
+                               "workers")
+        app.extensions["journal"] = Journal(app.config["WRITE_BEHIND_JOURNAL"])
+        app.register_blueprint(journal)
+
+    @app.cli.command("journal-worker")
+    @click.option("--once", is_flag=True,
+                  help="Flush the entries due and exit.")
+    def worker_command(once):
+        """Insert the submissions journaled in write-behind mode."""
+        if not app.config["WRITE_BEHIND"]:
+            raise click.ClickException("WRITE_BEHIND is off")
+        journal = app.extensions["journal"]
+        config = app.config
+        flushed = 0
+        pruned_at = 0
+        while True:
+            claimed = flush(journal, config)
+            flushed += claimed
+            if time.time() - pruned_at > 60:
+                journal.prune(config["WRITE_BEHIND_RETENTION"])
+                pruned_at = time.time()
+            if claimed < config["WRITE_BEHIND_BATCH_SIZE"]:
+                if once:
+                    break
+                # the journal is drained, wait for more
+                time.sleep(config["WRITE_BEHIND_INTERVAL"])
+        click.echo(f"Flushed {flushed} journal entries")
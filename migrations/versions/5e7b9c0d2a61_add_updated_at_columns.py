@@ -0,0 +1,40 @@
+"""add updated_at columns
+
+Revision ID: 5e7b9c0d2a61
+Revises: d91a5e3b7c42
+Create Date: 2026-10-18 19:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7b9c0d2a61'
+down_revision = 'd91a5e3b7c42'
+branch_labels = None
+depends_on = None
+
+
+def utc_now():
+    # the models write naive UTC times (datetime.utcnow); PostgreSQL's now()
+    # is in the server's time zone, SQLite's CURRENT_TIMESTAMP is UTC
+    if op.get_context().dialect.name == 'postgresql':
+        return sa.text("timezone('utc', now())")
+    return sa.func.current_timestamp()
+
+
+def upgrade():
+    # existing rows start out as modified now. No server default, like the
+    # models: every writer sets updated_at.
+    for table in ('venue', 'artist', 'show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(),
+                                       nullable=True))
+        op.execute(sa.table(table, sa.column('updated_at'))
+                   .update().values(updated_at=utc_now()))
+
+
+def downgrade():
+    for table in ('show', 'artist', 'venue'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,61 @@
+"""add show counters
+
+Revision ID: a4d2f8e6b193
+Revises: 5e7b9c0d2a61
+Create Date: 2026-10-18 21:30:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d2f8e6b193'
+down_revision = '5e7b9c0d2a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('show', sa.Column('upcoming', sa.Boolean(), nullable=False,
+                                    server_default=sa.true()))
+    op.create_index('ix_show_upcoming_start_time', 'show',
+                    ['upcoming', 'start_time'], unique=False)
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_show_count', sa.Integer(),
+                                       nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_show_count', sa.Integer(),
+                                       nullable=False, server_default='0'))
+
+    # count the existing shows, as `flask rollover-shows --recount` does;
+    # start times are local times, like datetime.now()
+    show = sa.table('show', sa.column('venue_id', sa.Integer),
+                    sa.column('artist_id', sa.Integer),
+                    sa.column('start_time', sa.DateTime),
+                    sa.column('upcoming', sa.Boolean))
+    op.execute(show.update()
+               .values(upcoming=show.c.start_time > datetime.now()))
+    for table, foreign_key in (('venue', 'venue_id'),
+                               ('artist', 'artist_id')):
+        parent = sa.table(table, sa.column('id', sa.Integer),
+                          sa.column('upcoming_show_count', sa.Integer),
+                          sa.column('past_show_count', sa.Integer))
+
+        def shows(upcoming):
+            return sa.select([sa.func.count()])\
+                .where(show.c[foreign_key] == parent.c.id)\
+                .where(show.c.upcoming == upcoming).as_scalar()
+        op.execute(parent.update().values(upcoming_show_count=shows(True),
+                                          past_show_count=shows(False)))
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('past_show_count')
+            batch_op.drop_column('upcoming_show_count')
+    op.drop_index('ix_show_upcoming_start_time', table_name='show')
+    with op.batch_alter_table('show') as batch_op:
+        batch_op.drop_column('upcoming')
@@ -0,0 +1,44 @@
+"""add show duration and overlap constraints
+
+Revision ID: c7e1b5d93f08
+Revises: a4d2f8e6b193
+Create Date: 2026-10-18 23:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e1b5d93f08'
+down_revision = 'a4d2f8e6b193'
+branch_labels = None
+depends_on = None
+
+
+SHOW_RANGE = "tsrange(start_time, start_time + duration * interval '1 minute')"
+
+
+def upgrade():
+    # existing shows last the default two hours
+    op.add_column('show', sa.Column('duration', sa.Integer(), nullable=False,
+                                    server_default='120'))
+    # PostgreSQL refuses overlapping shows of a venue or an artist (see
+    # models.py); this fails if the existing shows overlap, which must be
+    # rescheduled first. Other backends rely on the checks of bookings.py.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for column in ('venue_id', 'artist_id'):
+            op.execute(f'ALTER TABLE "show" ADD CONSTRAINT '
+                       f'ex_show_{column}_overlap EXCLUDE USING gist '
+                       f'({column} WITH =, {SHOW_RANGE} WITH &&) '
+                       f'WHERE (start_time IS NOT NULL)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in ('artist_id', 'venue_id'):
+            op.execute(f'ALTER TABLE "show" DROP CONSTRAINT '
+                       f'ex_show_{column}_overlap')
+    with op.batch_alter_table('show') as batch_op:
+        batch_op.drop_column('duration')
@@ -0,0 +1,50 @@
+"""add foreign key and lookup indexes
+
+Revision ID: d91a5e3b7c42
+Revises: 8c4e2d7a1f35
+Create Date: 2026-10-18 18:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91a5e3b7c42'
+down_revision = '8c4e2d7a1f35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # genre names must be deduplicated before this unique index can build
+    op.create_index(op.f('ix_genre_name'), 'genre', ['name'], unique=True)
+    op.create_index('ix_venue_city_state', 'venue', ['city', 'state'],
+                    unique=False)
+    op.create_index('ix_show_venue_id_start_time', 'show',
+                    ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show',
+                    ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_show_start_time', 'show', ['start_time'],
+                    unique=False)
+    op.create_index('ix_venue_genre_venue_id_genre_id', 'venue_genre',
+                    ['venue_id', 'genre_id'], unique=False)
+    op.create_index('ix_venue_genre_genre_id', 'venue_genre', ['genre_id'],
+                    unique=False)
+    op.create_index('ix_artist_genre_artist_id_genre_id', 'artist_genre',
+                    ['artist_id', 'genre_id'], unique=False)
+    op.create_index('ix_artist_genre_genre_id', 'artist_genre', ['genre_id'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artist_genre_genre_id', table_name='artist_genre')
+    op.drop_index('ix_artist_genre_artist_id_genre_id',
+                  table_name='artist_genre')
+    op.drop_index('ix_venue_genre_genre_id', table_name='venue_genre')
+    op.drop_index('ix_venue_genre_venue_id_genre_id', table_name='venue_genre')
+    op.drop_index('ix_show_start_time', table_name='show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
+    op.drop_index('ix_venue_city_state', table_name='venue')
+    op.drop_index(op.f('ix_genre_name'), table_name='genre')
@@ -0,0 +1,30 @@
+"""paginate venues by area
+
+Revision ID: e3f8a1c6b274
+Revises: c7e1b5d93f08
+Create Date: 2026-10-19 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3f8a1c6b274'
+down_revision = 'c7e1b5d93f08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # /venues is paginated on (state, city, id): the index follows that
+    # order, and still serves the (city, state) lookups of an area
+    op.create_index('ix_venue_state_city_id', 'venue',
+                    ['state', 'city', 'id'], unique=False)
+    op.drop_index('ix_venue_city_state', table_name='venue')
+
+
+def downgrade():
+    op.create_index('ix_venue_city_state', 'venue', ['city', 'state'],
+                    unique=False)
+    op.drop_index('ix_venue_state_city_id', table_name='venue')
@@ -1,40 +1,49 @@
-from flask import Flask
-from flask_moment import Moment
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from datetime import datetime
+from sqlalchemy import DDL, event
+from datetime import datetime, timedelta
 
 
 # ----------------------------------------------------------------------------#
-# App Config.
+# Database.
 # ----------------------------------------------------------------------------#
 
-# DONE: connect to a local postgresql database
-
-app = Flask(__name__)
-app.config.from_object("config")
-moment = Moment(app)
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+# bound to the app by create_app (see app.py)
+db = SQLAlchemy()
 
 
 # ----------------------------------------------------------------------
 # Models.
 # ----------------------------------------------------------------------
 
+# both sides of the association tables are indexed: genres are looked up
+# per venue/artist, and venues/artists per genre.
 venue_genre = db.Table("venue_genre",
                        db.Column("venue_id", db.Integer,
                                  db.ForeignKey("venue.id")),
-                       db.Column("genre_id", db.Integer, db.ForeignKey("genre.id")))
+                       db.Column("genre_id", db.Integer, db.ForeignKey("genre.id")),
+                       db.Index("ix_venue_genre_venue_id_genre_id",
+                                "venue_id", "genre_id"),
+                       db.Index("ix_venue_genre_genre_id", "genre_id"))
 
 artist_genre = db.Table("artist_genre",
                         db.Column("artist_id", db.Integer,
                                   db.ForeignKey("artist.id")),
-                        db.Column("genre_id", db.Integer, db.ForeignKey("genre.id")))
+                        db.Column("genre_id", db.Integer, db.ForeignKey("genre.id")),
+                        db.Index("ix_artist_genre_artist_id_genre_id",
+                                 "artist_id", "genre_id"),
+                        db.Index("ix_artist_genre_genre_id", "genre_id"))
 
 
 class Venue(db.Model):
     __tablename__ = "venue"
+    __table_args__ = (
+        # trigram index serving name ILIKE '%term%' searches on PostgreSQL
+        db.Index("ix_venue_name_trgm", "name", postgresql_using="gin",
+                 postgresql_ops={"name": "gin_trgm_ops"}),
+        # areas are (city, state) pairs, and /venues is paginated on
+        # (state, city, id)
+        db.Index("ix_venue_state_city_id", "state", "city", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
@@ -47,8 +56,22 @@ class Venue(db.Model):
 
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(500))
+    # last change of the row, or of a show/venue/artist displayed on its
+    # page (see touch_related_pages); feeds the HTTP validators
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+    # its upcoming and past shows, counted on write (see counters.py)
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0,
+                                    server_default="0")
+    past_show_count = db.Column(db.Integer, nullable=False, default=0,
+                                server_default="0")
     genre = db.relationship("Genre", secondary=venue_genre, backref="venue")
-    show = db.relationship("Show", back_populates="venue")
+    # a deleted venue takes its shows along, and out of its artists' counts.
+    # That costs a SELECT of all its shows into the session, and a DELETE
+    # per show: count_shows (counters.py) and the cache invalidation only
+    # see the shows the session deletes. A bulk DELETE would skip both.
+    show = db.relationship("Show", back_populates="venue",
+                           cascade="all, delete")
 
     def __repr__(self):
         return f"<{self.name} {self.city} {self.state}>"
@@ -56,6 +79,11 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = "artist"
+    __table_args__ = (
+        # trigram index serving name ILIKE '%term%' searches on PostgreSQL
+        db.Index("ix_artist_name_trgm", "name", postgresql_using="gin",
+                 postgresql_ops={"name": "gin_trgm_ops"}),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
@@ -67,6 +95,15 @@ class Artist(db.Model):
 
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(500))
+    # last change of the row, or of a show/venue/artist displayed on its
+    # page (see touch_related_pages); feeds the HTTP validators
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+    # its upcoming and past shows, counted on write (see counters.py)
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0,
+                                    server_default="0")
+    past_show_count = db.Column(db.Integer, nullable=False, default=0,
+                                server_default="0")
     genre = db.relationship("Genre", secondary=artist_genre, backref="artist")
     show = db.relationship("Show", back_populates="artist")
 
@@ -77,24 +114,120 @@ class Artist(db.Model):
 class Genre(db.Model):
     __tablename__ = "genre"
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, unique=True, index=True)
+
+
+# show durations in minutes: the default and the longest accepted, which
+# bounds the overlap checks of bookings.py
+SHOW_DURATION = 120
+MAX_SHOW_DURATION = 24 * 60
 
 
 class Show(db.Model):
     __tablename__ = "show"
+    __table_args__ = (
+        # the past/upcoming split of a venue or artist page is a range scan
+        # of these, the leading column doubling as the foreign key index
+        db.Index("ix_show_venue_id_start_time", "venue_id", "start_time"),
+        db.Index("ix_show_artist_id_start_time", "artist_id", "start_time"),
+        # /shows is ordered by start_time
+        db.Index("ix_show_start_time", "start_time"),
+        # `flask rollover-shows` looks for the upcoming shows that started
+        db.Index("ix_show_upcoming_start_time", "upcoming", "start_time"),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    venue_id = db.Column(db.Integer, db.ForeignKey("venue.id"))
-    artist_id = db.Column(db.Integer, db.ForeignKey("artist.id"))
-    start_time = db.Column(db.DateTime, default=datetime.utcnow)
+    # their previous values are loaded before they change, even on an
+    # expired show: the counters (counters.py) and the cached pages
+    # (cache.py) of the previous venue and artist are updated too
+    venue_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey("venue.id")), active_history=True)
+    artist_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey("artist.id")),
+        active_history=True)
+    start_time = db.column_property(
+        db.Column(db.DateTime, default=datetime.utcnow), active_history=True)
+    # minutes; a show may not overlap another show of its venue or artist
+    # (see bookings.py)
+    duration = db.Column(db.Integer, nullable=False, default=SHOW_DURATION,
+                         server_default=str(SHOW_DURATION))
+    # which counters of its venue and artist the show is in, upcoming or
+    # past (see counters.py)
+    upcoming = db.Column(db.Boolean, nullable=False, default=True,
+                         server_default=db.true())
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
     venue = db.relationship("Venue", back_populates="show")
     artist = db.relationship("Artist", back_populates="show")
     # artist = db.relationship(Artist, backref=db.backref('shows', cascade='all, delete'))
     # venue = db.relationship(Venue, backref=db.backref('shows', cascade='all, delete'))
 
+    @property
+    def end_time(self):
+        return self.start_time + timedelta(minutes=self.duration)
+
     def __repr__(self):
         return f"<v_id: {self.venue_id}, a_id: {self.artist_id}, {self.start_time}>"
 
 
+# PostgreSQL refuses overlapping shows of a venue or an artist by itself,
+# concurrent bookings included: btree_gist lets the equality on the id and
+# the overlap of the time ranges share one GiST index
+SHOW_RANGE = "tsrange(start_time, start_time + duration * interval '1 minute')"
+
+event.listen(Show.__table__, "before_create", DDL(
+    "CREATE EXTENSION IF NOT EXISTS btree_gist"
+).execute_if(dialect="postgresql"))
+for column in ("venue_id", "artist_id"):
+    event.listen(Show.__table__, "after_create", DDL(
+        f'ALTER TABLE "show" ADD CONSTRAINT ex_show_{column}_overlap '
+        f'EXCLUDE USING gist ({column} WITH =, {SHOW_RANGE} WITH &&) '
+        f'WHERE (start_time IS NOT NULL)'
+    ).execute_if(dialect="postgresql"))
+
+
+# ----------------------------------------------------------------------
+# Versioning.
+# ----------------------------------------------------------------------
+
+def touch_related_pages(session, flush_context, instances):
+    """before_flush: a venue page displays its shows and their artists, an
+    artist page its shows and their venues. Bump updated_at of every venue
+    and artist whose page is changed by this flush, so that their
+    updated_at alone tells whether their page changed."""
+    now = datetime.utcnow()
+    venue_ids = set()
+    artist_ids = set()
+    for instance in list(session.new) + list(session.dirty) + \
+            list(session.deleted):
+        if isinstance(instance, Show):
+            venue_ids.add(instance.venue_id)
+            artist_ids.add(instance.artist_id)
+        elif isinstance(instance, Venue) and instance.id is not None:
+            # its own row too: a genre change does not UPDATE it
+            venue_ids.add(instance.id)
+            artist_ids.update(id for id, in session.execute(
+                db.select([Show.artist_id])
+                .where(Show.venue_id == instance.id)))
+        elif isinstance(instance, Artist) and instance.id is not None:
+            artist_ids.add(instance.id)
+            venue_ids.update(id for id, in session.execute(
+                db.select([Show.venue_id])
+                .where(Show.artist_id == instance.id)))
+    venue_ids.discard(None)
+    artist_ids.discard(None)
+    if venue_ids:
+        session.execute(Venue.__table__.update()
+                        .where(Venue.id.in_(venue_ids))
+                        .values(updated_at=now))
+    if artist_ids:
+        session.execute(Artist.__table__.update()
+                        .where(Artist.id.in_(artist_ids))
+                        .values(updated_at=now))
+
+
+event.listen(db.session, "before_flush", touch_related_pages)
+
+
 # DONE Implement Show and Artist models, and complete all model
 # relationships and properties, as a database migration.
 # Shows: Venues-Artists + datetime (Association Object)
@@ -0,0 +1,119 @@
+from datetime import datetime
+from urllib.parse import quote, unquote
+
+from flask import current_app, request
+
+
+# ----------------------------------------------------------------------------#
+# Keyset pagination.
+# ----------------------------------------------------------------------------#
+
+# Pages are delimited by the sort key of their first and last row (the
+# cursor) instead of an OFFSET, so that the database seeks straight to the
+# page through the index and page 1000 costs the same as page 1.
+# ?after=<cursor> returns the rows following the cursor, ?before=<cursor>
+# the rows preceding it and ?limit= the page size.
+
+# the values of a cursor are percent-encoded, the separator included, so
+# that it may appear in a value (a city name of the venues' sort key)
+CURSOR_SEPARATOR = "_"
+ESCAPED_SEPARATOR = "%5F"
+
+
+def encode_cursor(row, keys):
+    """Turn the sort key of a row into an URL-safe cursor string."""
+    values = list()
+    for key in keys:
+        value = getattr(row, key.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        values.append(quote(str(value), safe="").replace(
+            CURSOR_SEPARATOR, ESCAPED_SEPARATOR))
+    return CURSOR_SEPARATOR.join(values)
+
+
+def decode_cursor(cursor, keys):
+    """Parse a cursor string back into a tuple of sort key values.
+    Returns None if the cursor is malformed."""
+    values = cursor.split(CURSOR_SEPARATOR)
+    if len(values) != len(keys):
+        return None
+    decoded = list()
+    try:
+        for key, value in zip(keys, map(unquote, values)):
+            if key.type.python_type is datetime:
+                decoded.append(datetime.fromisoformat(value))
+            else:
+                decoded.append(key.type.python_type(value))
+    except (ValueError, NotImplementedError):
+        return None
+    return tuple(decoded)
+
+
+def keyset_filter(keys, values, forward=True):
+    """Row comparison (keys) > (values) (or < when not forward), written
+    out as nested OR/AND so that every backend can use the index."""
+    key, value = keys[0], values[0]
+    if len(keys) == 1:
+        return key > value if forward else key < value
+    strict = key > value if forward else key < value
+    return strict | ((key == value) &
+                     keyset_filter(keys[1:], values[1:], forward))
+
+
+def page_limit():
+    """Read ?limit= from the request, clamped to [1, MAX_PAGE_SIZE]."""
+    default = current_app.config["PAGE_SIZE"]
+    limit = request.args.get("limit", default, type=int)
+    return max(1, min(limit, current_app.config["MAX_PAGE_SIZE"]))
+
+
+def paginate(query, keys, after=None, before=None, limit=None):
+    """Return one page of query, ordered by keys (a list of unique sort
+    columns, e.g. [Show.start_time, Show.id]). after and before default to
+    the ?after= and ?before= request arguments. Returns a dict:
+    page = {
+        "items": [...],
+        "limit": 20,
+        "next": "cursor of the last item, or None on the last page",
+        "prev": "cursor of the first item, or None on the first page"
+        }
+    """
+    if after is None and before is None:
+        after = request.args.get("after")
+        before = request.args.get("before")
+    if limit is None:
+        limit = page_limit()
+
+    forward = not before
+    cursor = before or after
+    values = decode_cursor(cursor, keys) if cursor else None
+    if values is None:
+        # no cursor, or a malformed one: start from the first page
+        forward = True
+
+    if values is not None:
+        query = query.filter(keyset_filter(keys, values, forward))
+    if forward:
+        query = query.order_by(*keys)
+    else:
+        query = query.order_by(*[key.desc() for key in keys])
+
+    # fetch one extra row to know whether there is a further page
+    items = query.limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+    if not forward:
+        items.reverse()
+
+    page = {"items": items, "limit": limit, "next": None, "prev": None}
+    if items:
+        if forward:
+            more_after, more_before = has_more, values is not None
+        else:
+            more_after, more_before = True, has_more
+        if more_after:
+            page["next"] = encode_cursor(items[-1], keys)
+        if more_before:
+            page["prev"] = encode_cursor(items[0], keys)
+    return page
@@ -0,0 +1,249 @@
+import heapq
+import os
+import threading
+import time
+
+import click
+from flask import current_app
+from sqlalchemy import event
+
+from models import db, Venue, Artist
+
+
+# ----------------------------------------------------------------------------#
+# Name search backends.
+# ----------------------------------------------------------------------------#
+
+# A backend ranks the rows of a model (Venue or Artist) whose name contains
+# a search term, case-insensitively, and returns the ids of the best `limit`
+# matches, best first. The views then load only those rows by primary key.
+
+def escape_like(term, escape="\\"):
+    """Escape the LIKE wildcards of a user supplied term."""
+    return term.replace(escape, escape * 2).replace("%", escape + "%")\
+        .replace("_", escape + "_")
+
+
+class PostgresSearch(object):
+    """Substring search served by the pg_trgm GIN indexes on venue.name and
+    artist.name (see the add trigram name indexes migration): ILIKE
+    '%term%' is answered from the index instead of a sequential scan, and
+    matches are ranked by trigram similarity."""
+
+    def search(self, model, term, limit):
+        pattern = f"%{escape_like(term)}%"
+        rows = db.session.query(model.id)\
+            .filter(model.name.ilike(pattern, escape="\\"))\
+            .order_by(db.func.similarity(model.name, term).desc(), model.id)\
+            .limit(limit)
+        return [row.id for row in rows]
+
+
+class PythonSearch(object):
+    """Portable fallback (SQLite, tests): scans the names in Python and
+    ranks by match position, then by name length, so that "Hop" finds
+    "Hop Shop" before "The Musical Hop"."""
+
+    def search(self, model, term, limit):
+        needle = term.lower()
+        matches = list()
+        for id, name in db.session.query(model.id, model.name):
+            name = name or ""
+            position = name.lower().find(needle)
+            if position >= 0:
+                matches.append((position, len(name), id))
+        return [id for position, length, id in
+                heapq.nsmallest(limit, matches)]
+
+
+class MemorySearch(object):
+    """In-process trigram inverted index over Venue.name and Artist.name.
+    Each name is lower-cased and cut to SEARCH_INDEX_MAX_NAME_LENGTH
+    characters, which bounds the memory used per entry; every trigram of
+    it maps to the set of ids containing it. A term of three characters or
+    more is looked up by intersecting the posting sets of its trigrams and
+    verifying the survivors, shorter terms scan the (small) name table.
+    Ranking is the same as PythonSearch.
+
+    The index is built on the first request of each process and kept in
+    sync with the commits of that process through session events (see
+    init_app). Writes made by other worker processes are picked up by
+    rebuilding once the index is older than SEARCH_INDEX_MAX_AGE seconds,
+    or when `flask rebuild-search-index` touches the SEARCH_INDEX_STAMP
+    file.
+    """
+
+    GRAM = 3
+    MODELS = (Venue, Artist)
+
+    def __init__(self, max_name_length=120):
+        self.max_name_length = max_name_length
+        self.lock = threading.Lock()
+        self.built_at = None
+        self.stamp = None
+        self.names = dict()
+        self.postings = dict()
+
+    def grams(self, text):
+        return {text[i:i + self.GRAM]
+                for i in range(len(text) - self.GRAM + 1)}
+
+    def rebuild(self, stamp=None):
+        """Reload every name from the database."""
+        names = {model.__tablename__: dict() for model in self.MODELS}
+        postings = {model.__tablename__: dict() for model in self.MODELS}
+        for model in self.MODELS:
+            for id, name in db.session.query(model.id, model.name):
+                self._add(names[model.__tablename__],
+                          postings[model.__tablename__], id, name)
+        with self.lock:
+            self.names, self.postings = names, postings
+            self.built_at = time.monotonic()
+            self.stamp = stamp
+
+    def is_stale(self, max_age, stamp):
+        return self.built_at is None or stamp != self.stamp or \
+            (max_age and time.monotonic() - self.built_at > max_age)
+
+    def update(self, table, id, name):
+        """Index (or re-index) a row, name=None removes it."""
+        with self.lock:
+            if self.built_at is None:
+                return  # the next build reads the committed state
+            names, postings = self.names[table], self.postings[table]
+            old = names.pop(id, None)
+            if old is not None:
+                for gram in self.grams(old):
+                    postings[gram].discard(id)
+                    if not postings[gram]:
+                        del postings[gram]
+            if name is not None:
+                self._add(names, postings, id, name)
+
+    def _add(self, names, postings, id, name):
+        name = (name or "").lower()[:self.max_name_length]
+        names[id] = name
+        for gram in self.grams(name):
+            postings.setdefault(gram, set()).add(id)
+
+    def search(self, model, term, limit):
+        stamp = read_stamp(current_app.config["SEARCH_INDEX_STAMP"])
+        if self.is_stale(current_app.config["SEARCH_INDEX_MAX_AGE"], stamp):
+            self.rebuild(stamp)
+        needle = term.lower()
+        with self.lock:
+            names = self.names[model.__tablename__]
+            postings = self.postings[model.__tablename__]
+            if len(needle) < self.GRAM:
+                candidates = names
+            else:
+                sets = sorted((postings.get(gram, set())
+                               for gram in self.grams(needle)), key=len)
+                candidates = set.intersection(*sets)
+            matches = list()
+            for id in candidates:
+                position = names[id].find(needle)
+                if position >= 0:
+                    matches.append((position, len(names[id]), id))
+        return [id for position, length, id in
+                heapq.nsmallest(limit, matches)]
+
+
+name_index = MemorySearch()
+
+BACKENDS = {
+    "postgresql": PostgresSearch,
+    "python": PythonSearch,
+}
+
+
+def search_backend():
+    """Return the in-memory index when SEARCH_INDEX_ENABLED, otherwise the
+    backend named by SEARCH_BACKEND; "auto" picks the trigram backend on
+    PostgreSQL and the Python one elsewhere."""
+    if current_app.config["SEARCH_INDEX_ENABLED"]:
+        return name_index
+    name = current_app.config["SEARCH_BACKEND"]
+    if name == "auto":
+        name = "postgresql" if db.engine.dialect.name == "postgresql" \
+            else "python"
+    return BACKENDS[name]()
+
+
+def search_names(model, term, limit=None):
+    """Ids of the rows of model whose name contains term, best match
+    first, at most SEARCH_RESULTS_LIMIT of them."""
+    if limit is None:
+        limit = current_app.config["SEARCH_RESULTS_LIMIT"]
+    return search_backend().search(model, term, limit)
+
+
+# ----------------------------------------------------------------------------#
+# In-memory index maintenance.
+# ----------------------------------------------------------------------------#
+
+def read_stamp(path):
+    """Modification time of the rebuild stamp file, None if missing."""
+    try:
+        return os.stat(path).st_mtime if path else None
+    except OSError:
+        return None
+
+
+def collect_name_changes(session, flush_context):
+    """after_flush: remember the venues and artists written by the flush,
+    to be applied to the index once (and only if) the transaction
+    commits."""
+    changes = session.info.setdefault("search_index_changes", list())
+    for instance in session.new | session.dirty:
+        if isinstance(instance, MemorySearch.MODELS):
+            changes.append((instance.__tablename__, instance.id,
+                            instance.name))
+    for instance in session.deleted:
+        if isinstance(instance, MemorySearch.MODELS):
+            changes.append((instance.__tablename__, instance.id, None))
+
+
+def apply_name_changes(session):
+    """after_commit: apply the collected changes to the index."""
+    for table, id, name in session.info.pop("search_index_changes", []):
+        name_index.update(table, id, name)
+
+
+def discard_name_changes(session):
+    """after_rollback: nothing was written, forget the collected changes."""
+    session.info.pop("search_index_changes", None)
+
+
+def touch_stamp(path):
+    """Running workers rebuild their index on their next search once the
+    stamp moves, e.g. after rows were written without the session."""
+    with open(path, "a"):
+        os.utime(path)
+
+
+def init_app(app):
+    """Register the index maintenance hooks and the rebuild command."""
+    name_index.max_name_length = app.config["SEARCH_INDEX_MAX_NAME_LENGTH"]
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index():
+        """Rebuild the in-memory venue and artist name index."""
+        path = app.config["SEARCH_INDEX_STAMP"]
+        touch_stamp(path)
+        name_index.rebuild(read_stamp(path))
+        click.echo(f"Indexed {sum(map(len, name_index.names.values()))} "
+                   f"names, workers will rebuild on their next search.")
+
+    if not app.config["SEARCH_INDEX_ENABLED"]:
+        return
+
+    @app.before_first_request
+    def build_search_index():
+        name_index.rebuild(read_stamp(app.config["SEARCH_INDEX_STAMP"]))
+
+    # db.session is shared by every app: listen once
+    if not event.contains(db.session, "after_flush", collect_name_changes):
+        event.listen(db.session, "after_flush", collect_name_changes)
+        event.listen(db.session, "after_commit", apply_name_changes)
+        event.listen(db.session, "after_rollback", discard_name_changes)
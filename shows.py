@@ -0,0 +1,118 @@
+import sys
+
+from flask import Blueprint, render_template, request, flash, redirect, \
+    url_for, abort, current_app
+
+from bookings import conflict
+from cache import cached
+from conditional import conditional_body
+from journal import accepted
+from models import db, Venue, Artist, Show, SHOW_DURATION
+from pagination import paginate
+
+
+shows = Blueprint("shows", __name__, url_prefix="/shows")
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@shows.route('')
+@conditional_body
+@cached("shows")
+def listing():
+    # displays list of shows at /shows
+    # DONE: replace with real venues data.
+    #       num_shows should be aggregated based on number of upcoming shows per venue.
+
+    # a single joined SELECT projecting only the columns the page renders:
+    # rows are plain tuples, no Show/Venue/Artist entity is loaded.
+    query = db.session.query(
+            Show.id, Show.start_time, Show.venue_id, Show.artist_id,
+            Venue.name.label("venue_name"),
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link")
+        ).join(Venue, Show.venue_id == Venue.id)\
+        .join(Artist, Show.artist_id == Artist.id)
+    page = paginate(query, [Show.start_time, Show.id])
+
+    shows = [{
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time
+        } for show in page["items"]]
+
+    return render_template('pages/shows.html', shows=shows, page=page)
+
+
+# forms (WTForms, Flask-WTF) are imported by the views rendering them, so
+# that starting a worker doesn't pay for them
+
+@shows.route('/create')
+def create_form():
+    # renders form. do not touch.
+    from forms import ShowForm
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@shows.route('/create', methods=['POST'])
+def create_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    # TODO: insert form data as a new Show record in the db, instead
+    from forms import ShowForm
+
+    form = ShowForm(request.form, meta={"csrf": False})
+
+    # Enforce form fields validation, rejecting malformed data
+    if not form.validate():
+        for k, v in form.errors.items():
+            flash(f"Show not saved: {v[0]}")
+        return redirect(url_for('.create_submission'))
+    try:
+        artist_id = int(form.artist_id.data.strip())
+        venue_id = int(form.venue_id.data.strip())
+    except ValueError:
+        flash("Show not saved: artist_id and venue_id must be integers")
+        return redirect(url_for('.create_submission'))
+    duration = form.duration.data or SHOW_DURATION
+
+    # Reject double bookings of the venue or the artist
+    double_booking = conflict(venue_id, artist_id, form.start_time.data,
+                              duration)
+    if double_booking:
+        flash(f"Show not saved: {double_booking}")
+        return redirect(url_for('.create_submission'))
+    elif current_app.config["WRITE_BEHIND"]:
+        return accepted("shows", "Show")
+    else:
+        error = False
+
+        show = Show(
+            artist_id=artist_id,
+            venue_id=venue_id,
+            start_time=form.start_time.data,
+            duration=duration
+        )
+
+        try:
+            db.session.add(show)
+            db.session.commit()
+            flash(f"Show successfully listed!")
+        except Exception as e:
+            print(sys.exc_info())
+            print(e)
+            error = True
+            db.session.rollback()
+        finally:
+            db.session.close()
+
+        if error:
+            # DONE: on unsuccessful db insert, flash an error instead.
+            flash(f"Show could not be listed.")
+            abort(500)
+
+    return redirect(url_for('index'))
@@ -0,0 +1,118 @@
+import os
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from bench.data import generate
+from config import TestingConfig
+from genres import genre_cache
+from models import db
+
+
+# ----------------------------------------------------------------------------#
+# Fixtures.
+# ----------------------------------------------------------------------------#
+
+# Each test gets its own SQLite file in its temporary directory, or the
+# database of TEST_DATABASE_URL (PostgreSQL), emptied first.
+
+def database_url(tmp_path, name):
+    return os.environ.get("TEST_DATABASE_URL") or \
+        "sqlite:///" + str(tmp_path / f"{name}.db")
+
+
+def empty_app(directory, name, **config):
+    """An app on an empty database, its files in directory."""
+    settings = dict(SQLALCHEMY_DATABASE_URI=database_url(directory, name),
+                    SEARCH_INDEX_STAMP=str(directory / "search.stamp"),
+                    ASSETS_OUTPUT=str(directory / "dist"))
+    settings.update(config)
+    app = create_app(type("Config", (TestingConfig,), settings))
+    # process-wide, filled from the database of the previous test
+    genre_cache.clear()
+    with app.app_context():
+        if db.engine.dialect.name == "postgresql":
+            db.session.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            db.session.commit()
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def fill_catalog(app, scale):
+    with app.app_context():
+        generate(scale)
+        db.session.remove()
+    return app
+
+
+def dispose(apps):
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """make_app(name="fyyur", **config): an app on an empty database."""
+    apps = list()
+
+    def make(name="fyyur", **config):
+        apps.append(empty_app(tmp_path, name, **config))
+        return apps[-1]
+
+    yield make
+    dispose(apps)
+
+
+@pytest.fixture
+def make_catalog(make_app):
+    """make_catalog(scale): an app on the generated catalog of scale (see
+    bench/__init__.py)."""
+    def make(scale, **config):
+        return fill_catalog(make_app(f"catalog-{scale}", **config), scale)
+    return make
+
+
+@pytest.fixture(scope="module")
+def shared_catalog(tmp_path_factory):
+    """shared_catalog(scale): an app on the generated catalog of scale,
+    generated once for the tests of a module, which must not write to
+    it."""
+    apps = dict()
+
+    def make(scale):
+        if scale not in apps:
+            directory = tmp_path_factory.mktemp(f"catalog-{scale}")
+            apps[scale] = fill_catalog(
+                empty_app(directory, f"catalog-{scale}"), scale)
+        return apps[scale]
+
+    yield make
+    dispose(apps.values())
+
+
+@pytest.fixture
+def statements():
+    """The SQL statements run while the returned list is recorded:
+    with statements(app) as recorded: ..."""
+    class Recorder(object):
+
+        def __init__(self, app):
+            with app.app_context():
+                self.engine = db.engine
+            self.recorded = list()
+
+        def record(self, conn, cursor, statement, *args):
+            self.recorded.append(statement)
+
+        def __enter__(self):
+            event.listen(self.engine, "before_cursor_execute", self.record)
+            return self.recorded
+
+        def __exit__(self, *exc_info):
+            event.remove(self.engine, "before_cursor_execute", self.record)
+
+    return Recorder
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def built(make_app):
+    """An app serving the assets built by `flask assets build`, and the
+    path of its main.css, given a (fake) brotli variant when brotli is not
+    installed."""
+    result = make_app().test_cli_runner().invoke(args=["assets", "build"])
+    assert result.exit_code == 0, result.output
+    app = make_app()
+    output = app.config["ASSETS_OUTPUT"]
+    filename = app.extensions["assets_manifest"]["main.css"]
+    path = os.path.join(output, filename)
+    if not os.path.isfile(path + ".br"):
+        with open(path + ".br", "wb") as f:
+            f.write(b"brotli")
+    return app, f"/assets/{filename}"
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("br, gzip", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("identity", None),
+])
+def test_precompressed_variant(built, accept, encoding):
+    app, url = built
+    response = app.test_client().get(url,
+                                     headers={"Accept-Encoding": accept})
+    assert response.status_code == 200
+    assert response.headers.get("Content-Encoding") == encoding
+    assert response.mimetype == "text/css"
+    assert "Accept-Encoding" in response.headers["Vary"]
@@ -0,0 +1,42 @@
+import pytest
+
+from bench import SCALES
+from bench.run import routes
+
+
+pytest.importorskip("pytest_benchmark")
+
+
+# ----------------------------------------------------------------------------#
+# Route benchmarks.
+# ----------------------------------------------------------------------------#
+
+# Every route of bench/run.py, timed by pytest-benchmark against the 10k
+# catalog (SQLite, or TEST_DATABASE_URL). `fab test` compares the medians
+# with the run saved by `fab baseline`; each case also fails when its
+# route runs more than MAX_QUERIES statements per request.
+
+SCALE = "10k"
+MAX_QUERIES = 3
+ROUTES = routes(SCALES[SCALE])
+
+
+@pytest.mark.parametrize("method, path, data", ROUTES,
+                         ids=[f"{method} {path}" for method, path, data
+                              in ROUTES])
+def test_route(benchmark, shared_catalog, statements, method, path, data):
+    app = shared_catalog(SCALE)
+    client = app.test_client()
+
+    def request():
+        if method == "POST":
+            return client.post(path, data=data)
+        return client.get(path)
+
+    assert request().status_code == 200  # warm-up: first request hooks
+    with statements(app) as recorded:
+        request()
+    assert len(recorded) <= MAX_QUERIES, "\n".join(recorded)
+
+    response = benchmark(request)
+    assert response.status_code == 200
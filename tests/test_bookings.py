@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from bookings import Bookings, conflict
+from models import db, Venue, Artist, Show, MAX_SHOW_DURATION
+
+
+# ----------------------------------------------------------------------------#
+# Double bookings.
+# ----------------------------------------------------------------------------#
+
+EIGHT_PM = datetime(2040, 1, 1, 20)
+
+
+@pytest.fixture
+def app(make_app):
+    """Two venues and two artists; artist 1 plays venue 1 from 20:00 to
+    22:00."""
+    app = make_app()
+    with app.app_context():
+        for id in (1, 2):
+            db.session.add(Venue(id=id, name=f"Venue {id}", city="Austin",
+                                 state="TX"))
+            db.session.add(Artist(id=id, name=f"Artist {id}"))
+        db.session.add(Show(venue_id=1, artist_id=1, start_time=EIGHT_PM))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def record(venue_id, artist_id, start_time, duration=120):
+    return {"venue_id": venue_id, "artist_id": artist_id,
+            "start_time": start_time, "duration": duration}
+
+
+def check(venue_id, artist_id, start_time, duration=120):
+    """The error of conflict(), and that of a batch of one show: they must
+    agree."""
+    error = conflict(venue_id, artist_id, start_time, duration)
+    batch = record(venue_id, artist_id, start_time, duration)
+    assert Bookings([batch]).book(batch) == error
+    return error
+
+
+@pytest.mark.parametrize("hour, minute", [(19, 0), (20, 0), (21, 59)])
+def test_same_venue(app, hour, minute):
+    start_time = EIGHT_PM.replace(hour=hour, minute=minute)
+    assert check(1, 2, start_time) == \
+        "venue_id: venue 1 has a show at 2040-01-01 20:00"
+
+
+def test_same_artist(app):
+    assert check(2, 1, EIGHT_PM + timedelta(hours=1)) == \
+        "artist_id: artist 1 has a show at 2040-01-01 20:00"
+
+
+def test_other_venue_and_artist(app):
+    assert check(2, 2, EIGHT_PM) is None
+
+
+@pytest.mark.parametrize("start_time, duration", [
+    (EIGHT_PM + timedelta(hours=2), 120),  # starts as it ends
+    (EIGHT_PM - timedelta(hours=1), 60),  # ends as it starts
+])
+def test_touching_shows(app, start_time, duration):
+    assert check(1, 1, start_time, duration) is None
+
+
+def test_long_show(app):
+    # a show of MAX_SHOW_DURATION, from 19:00 the day before to 19:00: found
+    # by the window of MAX_SHOW_DURATION before the start of a check
+    db.session.add(Show(venue_id=2, artist_id=2,
+                        start_time=EIGHT_PM - timedelta(days=1, hours=1),
+                        duration=MAX_SHOW_DURATION))
+    db.session.commit()
+    assert check(2, 1, EIGHT_PM - timedelta(hours=1), 60) is None
+    assert check(2, 1, EIGHT_PM - timedelta(hours=1, minutes=30), 60) == \
+        "venue_id: venue 2 has a show at 2039-12-31 19:00"
+
+
+def test_conflict_within_a_batch(app):
+    # none is in the database: the second conflicts with the first
+    records = [record(2, 2, EIGHT_PM + timedelta(days=1)),
+               record(1, 2, EIGHT_PM + timedelta(days=1, hours=1)),
+               record(2, 1, EIGHT_PM + timedelta(days=1, hours=3))]
+    bookings = Bookings(records)
+    assert bookings.book(records[0]) is None
+    assert bookings.book(records[1]) == \
+        "artist_id: artist 2 has a show at 2040-01-02 20:00"
+    assert bookings.book(records[2]) is None
+
+
+def test_batch_spanning_months(app):
+    # each record is checked against the shows around it only
+    records = [record(1, 2, EIGHT_PM - timedelta(days=90)),
+               record(2, 1, EIGHT_PM + timedelta(minutes=30)),
+               record(1, 2, EIGHT_PM + timedelta(days=90))]
+    bookings = Bookings(records)
+    assert [bookings.book(r) for r in records] == [
+        None, "artist_id: artist 1 has a show at 2040-01-01 20:00", None]
+
+
+# ----------------------------------------------------------------------------#
+# Show form.
+# ----------------------------------------------------------------------------#
+
+def test_show_form_refuses_a_double_booking(app):
+    client = app.test_client()
+    response = client.post("/shows/create", data={
+        "venue_id": "2", "artist_id": "1",
+        "start_time": "2040-01-01 21:00:00"}, follow_redirects=True)
+    assert b"Show not saved: artist_id: artist 1 has a show at " \
+           b"2040-01-01 20:00" in response.data
+    assert Show.query.count() == 1
+
+    response = client.post("/shows/create", data={
+        "venue_id": "2", "artist_id": "1",
+        "start_time": "2040-01-01 22:00:00"})
+    assert response.status_code == 302
+    assert Show.query.count() == 2
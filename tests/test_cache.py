@@ -0,0 +1,140 @@
+import os
+
+import pytest
+
+from cache import FileSystemCache
+from models import db, Genre, Show
+
+
+# ----------------------------------------------------------------------------#
+# Invalidation.
+# ----------------------------------------------------------------------------#
+
+# A write must invalidate the pages displaying what it changed, and only
+# those: the pages are named after the rows of the catalog they show.
+
+VENUE_FORM = {"name": "Hall", "city": "Austin", "state": "TX",
+              "address": "1 Main Street", "phone": "512-555-0100",
+              "genres": ["Jazz"], "seeking_talent": "No"}
+
+
+@pytest.fixture
+def catalog(make_catalog):
+    """The app and the ids of a venue, an artist who played there, and of
+    a venue and an artist who never met them."""
+    app = make_catalog("1k", CACHE_TYPE="lru")
+    with app.app_context():
+        venue_id, artist_id = db.session.query(Show.venue_id, Show.artist_id)\
+            .order_by(Show.id).first()
+        other_venue_id = db.session.query(Show.venue_id)\
+            .filter(Show.venue_id.notin_(
+                db.session.query(Show.venue_id)
+                .filter(Show.artist_id == artist_id)))\
+            .order_by(Show.venue_id).first()[0]
+        other_artist_id = db.session.query(Show.artist_id)\
+            .filter(Show.artist_id.notin_(
+                db.session.query(Show.artist_id)
+                .filter(Show.venue_id.in_([venue_id, other_venue_id]))))\
+            .order_by(Show.artist_id).first()[0]
+    pages = {
+        "venues": "/venues",
+        "artists": "/artists",
+        "shows": "/shows",
+        "venue": f"/venues/{venue_id}",
+        "artist": f"/artists/{artist_id}",
+        "other venue": f"/venues/{other_venue_id}",
+        "other artist": f"/artists/{other_artist_id}",
+    }
+    ids = {"venue": venue_id, "artist": artist_id,
+           "other venue": other_venue_id, "other artist": other_artist_id}
+    return app, pages, ids
+
+
+def cached_pages(app, pages):
+    """The names of the pages served from the cache."""
+    client = app.test_client()
+    return {name for name, url in pages.items()
+            if client.get(url).headers.get("X-Cache") == "HIT"}
+
+
+def create_venue(client, ids):
+    return client.post("/venues/create", data=VENUE_FORM)
+
+
+def edit_venue(client, ids):
+    return client.post(f"/venues/{ids['venue']}/edit", data=VENUE_FORM)
+
+
+def delete_venue(client, ids):
+    return client.post(f"/venues/{ids['venue']}")
+
+
+def create_show(client, ids):
+    return client.post("/shows/create", data={
+        "venue_id": str(ids["other venue"]),
+        "artist_id": str(ids["other artist"]),
+        "start_time": "2040-01-01 20:00:00"})
+
+
+def rename_genre(client, ids):
+    genre = Genre.query.filter_by(name="Jazz").one()
+    genre.name = "Jazz & Swing"
+    db.session.commit()
+
+
+ALL = {"venues", "artists", "shows", "venue", "artist", "other venue",
+       "other artist"}
+
+
+@pytest.mark.parametrize("write, invalidated", [
+    (create_venue, {"venues"}),
+    (edit_venue, {"venues", "shows", "venue", "artist"}),
+    (delete_venue, {"venues", "shows", "venue", "artist"}),
+    (create_show, {"venues", "shows", "other venue", "other artist"}),
+    (rename_genre, ALL),
+])
+def test_write_invalidates_its_pages(catalog, write, invalidated):
+    app, pages, ids = catalog
+    cached_pages(app, pages)
+    assert cached_pages(app, pages) == ALL
+
+    with app.app_context():
+        response = write(app.test_client(), ids)
+    assert response is None or response.status_code == 302
+    assert cached_pages(app, pages) == ALL - invalidated
+
+
+def test_rollback_invalidates_nothing(catalog):
+    app, pages, ids = catalog
+    cached_pages(app, pages)
+    with app.app_context():
+        Genre.query.filter_by(name="Jazz").one().name = "Jazz & Swing"
+        db.session.flush()
+        db.session.rollback()
+    assert cached_pages(app, pages) == ALL
+
+
+# ----------------------------------------------------------------------------#
+# Filesystem backend.
+# ----------------------------------------------------------------------------#
+
+def test_prune_keeps_the_tag_versions(make_catalog, tmp_path, monkeypatch):
+    # the tag versions are the oldest files of the cache, and every key
+    # depends on the "catalog" tag: pruning them empties the cache
+    monkeypatch.setattr(FileSystemCache, "PRUNE_INTERVAL", 5)
+    directory = tmp_path / "cache"
+    app = make_catalog("1k", CACHE_TYPE="filesystem",
+                       CACHE_DIR=str(directory), CACHE_MAX_ENTRIES=10)
+    client = app.test_client()
+    for limit in range(1, 41):
+        response = client.get(f"/venues?limit={limit}")
+        assert response.headers["X-Cache"] == "MISS"
+
+    names = os.listdir(directory)
+    entries = [name for name in names if not name.startswith("tag-")]
+    assert len(entries) <= 10 + FileSystemCache.PRUNE_INTERVAL
+    assert len(names) - len(entries) == 2  # "catalog" and "venues"
+    # the latest pages outlived the prunes
+    for limit in range(36, 41):
+        response = client.get(f"/venues?limit={limit}")
+        assert response.headers["X-Cache"] == "HIT"
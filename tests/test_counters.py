@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from counters import rollover, recount
+from models import db, Venue, Artist, Show
+
+
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+
+NOW = datetime.now().replace(microsecond=0)
+LATER = NOW + timedelta(days=30)
+EARLIER = NOW - timedelta(days=30)
+
+
+def counters(model, id):
+    """(upcoming, past) show counts stored on the row."""
+    row = db.session.query(model.upcoming_show_count,
+                           model.past_show_count).filter(model.id == id).one()
+    return tuple(row)
+
+
+@pytest.fixture
+def app(make_app):
+    """Two venues and two artists, without shows."""
+    app = make_app()
+    with app.app_context():
+        for id in (1, 2):
+            db.session.add(Venue(id=id, name=f"Venue {id}", city="Austin",
+                                 state="TX"))
+            db.session.add(Artist(id=id, name=f"Artist {id}"))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def add_show(venue_id=1, artist_id=1, start_time=LATER):
+    show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time)
+    db.session.add(show)
+    db.session.commit()
+    return show
+
+
+def test_create_show(app):
+    add_show()
+    add_show(start_time=EARLIER)
+    assert counters(Venue, 1) == counters(Artist, 1) == (1, 1)
+    assert counters(Venue, 2) == counters(Artist, 2) == (0, 0)
+
+
+def test_move_show_to_another_venue(app):
+    show = add_show()
+    show.venue_id = 2
+    db.session.commit()
+    assert counters(Venue, 1) == (0, 0)
+    assert counters(Venue, 2) == (1, 0)
+    assert counters(Artist, 1) == (1, 0)
+
+
+def test_move_show_to_the_past(app):
+    show = add_show()
+    show.start_time = EARLIER
+    db.session.commit()
+    assert counters(Venue, 1) == counters(Artist, 1) == (0, 1)
+
+
+def test_delete_show(app):
+    show = add_show()
+    db.session.delete(show)
+    db.session.commit()
+    assert counters(Venue, 1) == counters(Artist, 1) == (0, 0)
+
+
+def test_delete_venue(app):
+    # its shows go with it, and out of their artists' counts
+    add_show(1, 1)
+    add_show(1, 2, start_time=EARLIER)
+    add_show(2, 2, start_time=LATER + timedelta(days=1))
+    db.session.delete(Venue.query.get(1))
+    db.session.commit()
+    assert Show.query.count() == 1
+    assert counters(Artist, 1) == (0, 0)
+    assert counters(Artist, 2) == (1, 0)
+    assert counters(Venue, 2) == (1, 0)
+
+
+def test_rollover(app):
+    add_show(start_time=NOW + timedelta(hours=1))
+    add_show(1, 2, start_time=NOW + timedelta(hours=3))
+    assert rollover(now=NOW + timedelta(hours=2)) == 1
+    assert counters(Venue, 1) == (1, 1)
+    assert counters(Artist, 1) == (0, 1)
+    assert counters(Artist, 2) == (1, 0)
+    # the show moved once
+    assert rollover(now=NOW + timedelta(hours=2)) == 0
+    assert counters(Venue, 1) == (1, 1)
+
+
+def test_recount_matches_the_shows(make_catalog):
+    app = make_catalog("1k")
+    with app.app_context():
+        # counters off, e.g. after plain INSERTs
+        for model in (Venue, Artist):
+            db.session.execute(model.__table__.update().values(
+                upcoming_show_count=7, past_show_count=0))
+        db.session.commit()
+        recount()
+        for model, foreign_key in ((Venue, Show.venue_id),
+                                   (Artist, Show.artist_id)):
+            expected = {id: [0, 0] for id, in db.session.query(model.id)}
+            for id, upcoming, count in db.session.query(
+                    foreign_key, Show.start_time > datetime.now(),
+                    db.func.count()).group_by(
+                    foreign_key, Show.start_time > datetime.now()):
+                expected[id][0 if upcoming else 1] = count
+            stored = {id: [upcoming, past] for id, upcoming, past in
+                      db.session.query(model.id, model.upcoming_show_count,
+                                       model.past_show_count)}
+            assert stored == expected
@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.mark.parametrize("enabled, status", [(False, 404), (True, 200)])
+def test_downloads_are_opt_in(make_app, enabled, status):
+    client = make_app(EXPORT_HTTP=enabled).test_client()
+    for url in ("/export/venues.ndjson", "/export/shows.csv"):
+        assert client.get(url).status_code == status
+
+
+def test_command_needs_no_opt_in(make_app):
+    result = make_app().test_cli_runner().invoke(
+        args=["export", "venues", "--format", "csv"])
+    assert result.exit_code == 0, result.output
+    assert result.output.startswith("id,name,")
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from bench.data import GENRES, generate
+from importer import init_app as init_importer
+from models import db, Genre, Venue
+
+
+KINDS = ("venues", "artists", "shows")
+
+
+def export_all(app, format):
+    client = app.test_client()
+    return {kind: client.get(f"/export/{kind}.{format}").get_data(as_text=True)
+            for kind in KINDS}
+
+
+def records(ndjson):
+    """The exported records by id, without updated_at (the time of the
+    write)."""
+    rows = [json.loads(line) for line in ndjson.splitlines()]
+    for row in rows:
+        del row["updated_at"]
+    return {row["id"]: row for row in rows}
+
+
+def import_file(app, tmp_path, kind, format, text, *options):
+    path = tmp_path / f"{kind}.{format}"
+    path.write_text(text, encoding="utf-8")
+    return app.test_cli_runner().invoke(args=["import", kind, str(path),
+                                              *options])
+
+
+@pytest.mark.parametrize("format", ["csv", "ndjson"])
+@pytest.mark.parametrize("options", [[], ["--trusted"]])
+def test_export_round_trip(make_catalog, make_app, tmp_path, format,
+                           options):
+    catalog = make_catalog("1k", EXPORT_HTTP=True)
+    exported = export_all(catalog, format)
+    expected = export_all(catalog, "ndjson")
+
+    app = make_app("imported", EXPORT_HTTP=True)
+    init_importer(app)
+    with app.app_context():
+        db.session.add_all(Genre(name=name) for name in GENRES)
+        db.session.commit()
+    for kind in KINDS:
+        result = import_file(app, tmp_path, kind, format, exported[kind],
+                             *options)
+        assert result.exit_code == 0, result.output
+        assert "0 rejected" in result.output, result.output
+    imported = export_all(app, "ndjson")
+    for kind in KINDS:
+        assert records(imported[kind]) == records(expected[kind])
+
+    # the ids are taken now
+    result = import_file(app, tmp_path, "venues", format, exported["venues"],
+                         *options)
+    assert "0 imported, 50 rejected" in result.output
+    assert "id: venue 1 already exists" in result.output
+    # and new rows come after them
+    response = app.test_client().post("/venues/create", data={
+        "name": "Hall", "city": "Austin", "state": "TX",
+        "address": "1 Main Street", "phone": "512-555-0100",
+        "genres": ["Jazz"], "seeking_talent": "No"})
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.query(db.func.max(Venue.id)).scalar() == 51
+
+
+def test_form_input_rows(make_app, tmp_path):
+    app = make_app()
+    init_importer(app)
+    with app.app_context():
+        generate("1k")
+    result = import_file(app, tmp_path, "venues", "csv",
+                         "name,city,state,address,phone,genres,"
+                         "seeking_talent\n"
+                         "Hall,Austin,TX,1 Main St,512-555-0100,Jazz;Blues,"
+                         "Yes\n"
+                         "Bad,Austin,TX,1 Main St,5125550,Jazz,No\n")
+    assert "1 imported, 1 rejected" in result.output
+    assert "line 3: phone" in result.output
+    with app.app_context():
+        venue = Venue.query.get(51)
+        assert (venue.name, venue.phone, venue.seeking_talent) == \
+            ("Hall", "5125550100", True)
+
+
+def test_trusted_rows_are_parsed(make_app, tmp_path):
+    app = make_app()
+    init_importer(app)
+    with app.app_context():
+        generate("1k")
+    rows = [{"venue_id": 1, "artist_id": 1, "start_time": "soon",
+             "duration": 120},
+            {"venue_id": 1, "artist_id": 1, "start_time": "2040-01-01T20:00",
+             "duration": "long"},
+            {"venue_id": 1, "artist_id": 1, "start_time": "2040-01-01T20:00",
+             "duration": 120}]
+    result = import_file(app, tmp_path, "shows", "ndjson",
+                         "".join(json.dumps(row) + "\n" for row in rows),
+                         "--trusted")
+    assert "1 imported, 2 rejected" in result.output
+    assert "line 1: start_time: invalid value 'soon'" in result.output
+    assert "line 2: duration: invalid value 'long'" in result.output
@@ -0,0 +1,36 @@
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+
+def test_server_timing(make_catalog):
+    app = make_catalog("1k", INSTRUMENTATION_ENABLED=True)
+    client = app.test_client()
+    client.get("/venues")  # first request hooks
+    response = client.get("/venues")
+    assert 'db;dur=' in response.headers["Server-Timing"]
+    assert 'desc="1 queries"' in response.headers["Server-Timing"]
+    metrics = client.get("/internal/metrics").get_data(as_text=True)
+    assert 'fyyur_requests_total{endpoint="venues.listing"}' in metrics
+
+
+def test_failed_statements(make_app):
+    # counted and timed like the others, and leaving nothing behind on the
+    # pooled connection
+    app = make_app(INSTRUMENTATION_ENABLED=True)
+
+    @app.route("/failing")
+    def failing():
+        # one connection, as kept by a pool
+        connection = db.session.connection()
+        for attempt in range(3):
+            try:
+                connection.execute("SELECT * FROM missing")
+            except OperationalError:
+                pass
+        connection.execute("SELECT 1")
+        return repr(dict(connection.info))
+
+    response = app.test_client().get("/failing")
+    assert response.get_data(as_text=True) == "{}"
+    assert 'desc="4 queries"' in response.headers["Server-Timing"]
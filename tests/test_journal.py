@@ -0,0 +1,142 @@
+import threading
+import time
+from contextlib import closing
+
+import pytest
+
+from journal import Journal, flush
+from models import db, Venue, Artist, Genre
+
+
+# ----------------------------------------------------------------------------#
+# Write-behind journal.
+# ----------------------------------------------------------------------------#
+
+VENUE_FORM = {"name": "Hall", "city": "Austin", "state": "TX",
+              "address": "1 Main Street", "phone": "512-555-0100",
+              "genres": ["Jazz"], "seeking_talent": "No"}
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    """An app in write-behind mode, with a venue, an artist and a genre."""
+    app = make_app(WRITE_BEHIND=True, WRITE_BEHIND_MAX_ATTEMPTS=3,
+                   WRITE_BEHIND_JOURNAL=str(tmp_path / "journal.sqlite3"))
+    with app.app_context():
+        db.session.add(Venue(id=1, name="Venue", city="Austin", state="TX"))
+        db.session.add(Artist(id=1, name="Artist"))
+        db.session.add(Genre(name="Jazz"))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def submit(app, url, data):
+    """Post a create form; returns the key of its journal entry."""
+    response = app.test_client().post(url, data=data)
+    assert response.status_code == 302
+    return response.headers["X-Journal-Entry"].rsplit("/", 1)[1]
+
+
+def status(app, key):
+    return dict(app.extensions["journal"].status(key))
+
+
+def due_at(journal, key):
+    with closing(journal.connect()) as connection:
+        return connection.execute("SELECT due_at FROM entry WHERE key = ?",
+                                  (key,)).fetchone()[0]
+
+
+def make_due(app):
+    """Skip the backoff of the retried entries."""
+    with closing(app.extensions["journal"].connect()) as connection:
+        connection.execute("UPDATE entry SET due_at = 0 "
+                           "WHERE state = 'queued'")
+
+
+def test_flush(app):
+    key = submit(app, "/venues/create", VENUE_FORM)
+    assert status(app, key)["state"] == "queued"
+    assert Venue.query.count() == 1  # not written yet
+
+    assert flush(app.extensions["journal"], app.config) == 1
+    assert status(app, key)["state"] == "done"
+    assert Venue.query.filter_by(name="Hall").count() == 1
+    assert app.extensions["journal"].summary()["done"] == 1
+
+
+def test_rejected_at_flush(app):
+    # both accepted, as neither was in the database yet
+    keys = [submit(app, "/shows/create", {
+        "venue_id": "1", "artist_id": "1",
+        "start_time": f"2040-01-01 {hour}:00:00"}) for hour in (20, 21)]
+    flush(app.extensions["journal"], app.config)
+    first, second = [status(app, key) for key in keys]
+    assert first["state"] == "done"
+    assert second["state"] == "rejected"
+    assert second["error"] == "venue_id: venue 1 has a show at 2040-01-01 " \
+                              "20:00"
+
+
+def test_failing_entry_is_retried_then_failed(app):
+    # a transaction the database refuses, whatever the form said
+    db.session.execute("CREATE TRIGGER broken BEFORE INSERT ON venue "
+                       "WHEN NEW.name = 'Broken' "
+                       "BEGIN SELECT RAISE(ABORT, 'broken venue'); END")
+    db.session.commit()
+    broken = submit(app, "/venues/create", dict(VENUE_FORM, name="Broken"))
+    fine = submit(app, "/venues/create", VENUE_FORM)
+
+    journal = app.extensions["journal"]
+    # the batch fails, then each entry is tried in its own transaction
+    for attempts in (1, 2):
+        flushed_at = time.time()
+        flush(journal, app.config)
+        assert status(app, fine)["state"] == "done"
+        entry = status(app, broken)
+        assert (entry["state"], entry["attempts"], entry["error"]) == \
+            ("queued", attempts, "broken venue")
+        # due again 2 ** (attempts - 1) seconds later: 1 s, then 2 s
+        backoff = due_at(journal, broken) - flushed_at
+        assert 2 ** (attempts - 1) <= backoff < 2 ** (attempts - 1) + 1
+        assert flush(journal, app.config) == 0
+        make_due(app)
+
+    # WRITE_BEHIND_MAX_ATTEMPTS is 3
+    assert flush(journal, app.config) == 1
+    entry = status(app, broken)
+    assert (entry["state"], entry["attempts"], entry["error"]) == \
+        ("failed", 3, "broken venue")
+    assert flush(journal, app.config) == 0
+    assert Venue.query.filter_by(name="Broken").count() == 0
+    assert Venue.query.filter_by(name="Hall").count() == 1
+
+
+def test_claim_is_exclusive(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    journal = Journal(path)
+    for i in range(200):
+        journal.append("venues", [["name", f"Venue {i}"]])
+
+    claimed = list()
+
+    def worker():
+        # a process of its own: its own connections
+        journal = Journal(path)
+        while True:
+            entries = journal.claim(7, 300)
+            if not entries:
+                return
+            claimed.extend(entry["id"] for entry in entries)
+
+    workers = [threading.Thread(target=worker) for i in range(8)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    assert sorted(claimed) == list(range(1, 201))
+
+    # a claimed entry goes to another worker once its lease expired only
+    assert journal.claim(10, 300) == []
+    assert len(journal.claim(10, 0)) == 10
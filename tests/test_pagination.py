@@ -0,0 +1,106 @@
+import html
+import re
+from datetime import datetime
+from types import SimpleNamespace
+from urllib.parse import quote
+
+import pytest
+
+from models import db, Venue, Show
+from pagination import encode_cursor, decode_cursor, page_limit
+
+
+VENUE_KEYS = [Venue.state, Venue.city, Venue.id]
+SHOW_KEYS = [Show.start_time, Show.id]
+
+
+# ----------------------------------------------------------------------------#
+# Cursors.
+# ----------------------------------------------------------------------------#
+
+@pytest.mark.parametrize("keys, values", [
+    (VENUE_KEYS, ("ID", "Coeur_d_Alene", 7)),
+    (VENUE_KEYS, ("NY", "New York", 12)),
+    (VENUE_KEYS, ("CA", "50%_off %5F", 3)),
+    (SHOW_KEYS, (datetime(2035, 4, 1, 20, 30), 41)),
+])
+def test_cursor_round_trip(keys, values):
+    row = SimpleNamespace(**{key.key: value
+                             for key, value in zip(keys, values)})
+    cursor = encode_cursor(row, keys)
+    assert cursor.count("_") == len(keys) - 1
+    assert decode_cursor(cursor, keys) == values
+
+
+@pytest.mark.parametrize("keys, cursor", [
+    (VENUE_KEYS, "NY_New York"),
+    (VENUE_KEYS, "NY_New_York_12"),
+    (VENUE_KEYS, "NY_New York_twelve"),
+    (SHOW_KEYS, "yesterday_41"),
+])
+def test_malformed_cursor(keys, cursor):
+    assert decode_cursor(cursor, keys) is None
+
+
+@pytest.mark.parametrize("limit, expected", [
+    (None, 20), ("7", 7), ("0", 1), ("-5", 1), ("1000", 100), ("many", 20)])
+def test_limit_bounds(make_app, limit, expected):
+    app = make_app()
+    query = "" if limit is None else f"?limit={limit}"
+    with app.test_request_context("/venues" + query):
+        assert page_limit() == expected
+
+
+# ----------------------------------------------------------------------------#
+# /venues pages.
+# ----------------------------------------------------------------------------#
+
+def venues_page(client, url):
+    """The venue ids, areas and pager links of the page at url."""
+    text = client.get(url).get_data(as_text=True)
+    areas = re.findall(r"<h3>(.*), (.*)</h3>", text)
+    links = {name: html.unescape(href) for name, href in re.findall(
+        r'<li class="(previous|next)"><a href="([^"]+)"', text)}
+    return [int(id) for id in re.findall(r'href="/venues/(\d+)"', text)], \
+        [(html.unescape(city), state) for city, state in areas], links
+
+
+def test_venue_pages_follow_the_areas(make_catalog):
+    app = make_catalog("1k")
+    with app.app_context():
+        for id in (51, 52):
+            db.session.add(Venue(id=id, name=f"Lake Hall {id}",
+                                 city="Coeur_d_Alene", state="ID"))
+        db.session.commit()
+        expected = [id for id, in db.session.query(Venue.id)
+                    .order_by(*VENUE_KEYS)]
+    client = app.test_client()
+
+    pages, areas = list(), list()
+    url = "/venues?limit=7"
+    while url:
+        ids, page_areas, links = venues_page(client, url)
+        assert 0 < len(ids) <= 7
+        pages.append(ids)
+        areas += page_areas
+        url = links.get("next")
+    assert [id for ids in pages for id in ids] == expected
+    # an area continues on the next page, and is never seen again after
+    runs = [area for i, area in enumerate(areas)
+            if i == 0 or areas[i - 1] != area]
+    assert len(runs) == len(set(runs))
+    assert ("Coeur_d_Alene", "ID") in runs
+
+    # and back from the last venue
+    with app.app_context():
+        cursor = quote(encode_cursor(Venue.query.get(expected[-1]),
+                                     VENUE_KEYS))
+    ids, _, links = venues_page(client, f"/venues?limit=7&after={cursor}")
+    assert ids == [] and links == {}
+    backwards = list()
+    url = f"/venues?limit=7&before={cursor}"
+    while url:
+        ids, _, links = venues_page(client, url)
+        backwards.insert(0, ids)
+        url = links.get("previous")
+    assert [id for ids in backwards for id in ids] == expected[:-1]
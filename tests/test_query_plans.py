@@ -0,0 +1,135 @@
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from bookings import Bookings
+from models import db, Venue, Artist, Genre, Show, venue_genre, artist_genre
+from pagination import keyset_filter
+
+
+# ----------------------------------------------------------------------------#
+# Query plans.
+# ----------------------------------------------------------------------------#
+
+# The lookups of the detail pages and forms must be index scans, whatever
+# the size of the catalog: EXPLAIN QUERY PLAN on SQLite, EXPLAIN on
+# PostgreSQL. The tables of a test catalog are small enough for PostgreSQL
+# to prefer a sequential scan, so those are turned off: the test checks
+# that an index can serve the query, not the planner's cost estimates.
+
+NOW = datetime(2030, 1, 1)
+
+VENUE_KEYS = [Venue.state, Venue.city, Venue.id]
+
+CASES = {
+    "venues by area": (
+        lambda: Venue.query.with_entities(Venue.id, Venue.name)
+        .filter(keyset_filter(VENUE_KEYS, ("IL", "Chicago", 20)))
+        .order_by(*VENUE_KEYS).limit(21),
+        "ix_venue_state_city_id"),
+    "venue shows": (
+        lambda: db.session.query(Show.start_time, Artist.name)
+        .join(Artist, Show.artist_id == Artist.id)
+        .filter(Show.venue_id == 25).order_by(Show.start_time),
+        "ix_show_venue_id_start_time"),
+    "venue upcoming shows": (
+        lambda: Show.query.filter(Show.venue_id == 25,
+                                  Show.start_time > NOW),
+        "ix_show_venue_id_start_time"),
+    "artist shows": (
+        lambda: db.session.query(Show.start_time, Venue.name)
+        .join(Venue, Show.venue_id == Venue.id)
+        .filter(Show.artist_id == 50).order_by(Show.start_time),
+        "ix_show_artist_id_start_time"),
+    "artist upcoming shows": (
+        lambda: Show.query.filter(Show.artist_id == 50,
+                                  Show.start_time > NOW),
+        "ix_show_artist_id_start_time"),
+    "genres by name": (
+        lambda: db.session.query(Genre.name, Genre.id)
+        .filter(Genre.name.in_(["Jazz", "Blues"])),
+        "ix_genre_name"),
+    "genres of a venue": (
+        lambda: Venue.query
+        .outerjoin(venue_genre, venue_genre.c.venue_id == Venue.id)
+        .outerjoin(Genre, Genre.id == venue_genre.c.genre_id)
+        .options(db.contains_eager(Venue.genre))
+        .filter(Venue.id == 25),
+        "ix_venue_genre_venue_id_genre_id"),
+    "venues of a genre": (
+        lambda: db.session.query(venue_genre.c.venue_id)
+        .filter(venue_genre.c.genre_id == 3),
+        "ix_venue_genre_genre_id"),
+    "genres of an artist": (
+        lambda: Artist.query
+        .outerjoin(artist_genre, artist_genre.c.artist_id == Artist.id)
+        .outerjoin(Genre, Genre.id == artist_genre.c.genre_id)
+        .options(db.contains_eager(Artist.genre))
+        .filter(Artist.id == 50),
+        "ix_artist_genre_artist_id_genre_id"),
+    "artists of a genre": (
+        lambda: db.session.query(artist_genre.c.artist_id)
+        .filter(artist_genre.c.genre_id == 3),
+        "ix_artist_genre_genre_id"),
+}
+
+
+def explain(run):
+    """The plans of the statements run() executes, one string per step."""
+    executed = list()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        run()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    plan = list()
+    cursor = db.session.connection().connection.cursor()
+    # the statements and parameters as sent to the driver
+    for statement, parameters in executed:
+        if db.engine.dialect.name == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN " + statement, parameters)
+            plan += [row[0] for row in cursor.fetchall()]
+        else:
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            plan += [row[-1] for row in cursor.fetchall()]
+    return plan
+
+
+def index_scan(index):
+    # SQLite: SEARCH show USING INDEX ix_... (venue_id=?)
+    # PostgreSQL: Index Scan using ix_... on show, Bitmap Index Scan on ix_...
+    return re.compile(r"(USING (COVERING )?INDEX|Index (Only )?Scan "
+                      rf"(using|on)) {index}\b")
+
+
+@pytest.fixture
+def catalog(make_catalog):
+    app = make_catalog("1k")
+    with app.app_context():
+        yield app
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_lookup_uses_an_index(catalog, case):
+    query, index = CASES[case]
+    plan = explain(query().all)
+    assert any(index_scan(index).search(step) for step in plan), \
+        "\n".join(plan)
+
+
+def test_bookings_use_both_indexes(catalog):
+    # one range of an index per venue and artist of a batch of shows
+    records = [{"venue_id": id, "artist_id": id, "start_time": NOW,
+                "duration": 120} for id in (25, 50)]
+    plan = explain(lambda: Bookings(records))
+    for index in ("ix_show_venue_id_start_time",
+                  "ix_show_artist_id_start_time"):
+        assert any(index_scan(index).search(step) for step in plan), \
+            "\n".join(plan)
@@ -0,0 +1,13 @@
+def test_listing_statements_do_not_grow_with_the_catalog(make_catalog,
+                                                         statements):
+    # /venues used to run a query per area and per venue
+    counts = dict()
+    for scale in ("1k", "10k"):
+        app = make_catalog(scale)
+        client = app.test_client()
+        client.get("/venues")  # first request hooks
+        with statements(app) as recorded:
+            response = client.get("/venues")
+        assert response.status_code == 200
+        counts[scale] = len(recorded)
+    assert counts == {"1k": 1, "10k": 1}
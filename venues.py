@@ -0,0 +1,324 @@
+import re
+import sys
+from datetime import datetime
+
+from flask import Blueprint, render_template, request, flash, redirect, \
+    url_for, abort, current_app
+
+from cache import cached, cache_until
+from conditional import conditional, conditional_body
+from genres import resolve_genres
+from helpers import to_dict, split_shows
+from journal import accepted
+from models import db, Venue, Artist, Genre, Show, venue_genre
+from pagination import paginate
+from search import search_names
+
+
+venues = Blueprint("venues", __name__, url_prefix="/venues")
+
+
+# ----------------------------------------------------------------------------#
+#  Venues
+# ----------------------------------------------------------------------------#
+
+@venues.route('')
+@conditional_body
+@cached("venues")
+def listing():
+
+    # DONE this route passes the data dict to the view.
+    # store this data into the db
+    # write the route so that it pulls this very same data from the db
+
+    # DONE: replace with real venues data.
+    #       num_shows should be aggregated based on number of upcoming
+    #       shows per venue.
+
+    # one statement for a page of venues, with their upcoming show counts
+    # (maintained by counters.py); the page is then grouped by (city, state).
+    # Pages follow the areas' order, so that an area spans consecutive
+    # pages instead of showing up on every one of them.
+    page = paginate(Venue.query.with_entities(
+            Venue.id, Venue.name, Venue.city, Venue.state,
+            Venue.upcoming_show_count.label("num_upcoming_shows")
+        ), [Venue.state, Venue.city, Venue.id])
+
+    areas = dict()
+    for venue in page["items"]:
+        # areas are matched on the (city, state) pair, not on city alone
+        area = areas.setdefault((venue.city, venue.state), {
+            "city": venue.city,
+            "state": venue.state,
+            "venues": [],
+        })
+        area["venues"].append({
+            "id": venue.id,
+            "name": venue.name,
+            "num_upcoming_shows": venue.num_upcoming_shows
+        })
+    # in the order of the page, by state then city
+    data = list(areas.values())
+
+    return render_template('pages/venues.html', areas=data, page=page)
+
+
+@venues.route('/search', methods=['POST'])
+def search():
+
+    # DONE: implement search on artists with partial string search.
+    #       Ensure it is case-insensitive.
+    #       seach for Hop should return "The Musical Hop".
+    #       search for "Music" should return "The Musical Hop" and "Park
+    #       Square Live Music & Coffee"
+
+    search_term = request.form.get("search_term").strip()
+    # ranked ids of the best matches, then one lookup by primary key
+    venue_ids = search_names(Venue, search_term)
+    venues = Venue.query.with_entities(
+            Venue.id, Venue.name,
+            Venue.upcoming_show_count.label("num_upcoming_shows")
+        ).filter(Venue.id.in_(venue_ids)).all() if venue_ids else []
+    rank = {venue_id: i for i, venue_id in enumerate(venue_ids)}
+    venues.sort(key=lambda venue: rank[venue.id])
+
+    data = list()
+    for venue in venues:
+        venue_data = {
+            "id": venue.id,
+            "name": venue.name,
+            "num_upcoming_shows": venue.num_upcoming_shows
+        }
+        data.append(venue_data)
+    response = {
+        "count": len(venues),
+        "data": data
+    }
+
+    return render_template('pages/search_venues.html', results=response,
+                           search_term=request.form.get('search_term', ''))
+
+
+@venues.route('/<int:venue_id>')
+@conditional(Venue, Show.venue_id, "venue_id")
+@cached("venue:{venue_id}")
+def show(venue_id):
+    # shows the venue page with the given venue_id
+    # DONE: replace with real venue data from the venues table, using venue_id
+
+    # the venue and its genres in one query, its shows in a second one. The
+    # genre tables are outer joined one after the other: SQLite scans the
+    # whole (venue_genre JOIN genre) group joinedload would emit, instead of
+    # looking it up by venue_id.
+    venue = Venue.query\
+        .outerjoin(venue_genre, venue_genre.c.venue_id == Venue.id)\
+        .outerjoin(Genre, Genre.id == venue_genre.c.genre_id)\
+        .options(db.contains_eager(Venue.genre))\
+        .filter(Venue.id == venue_id).one_or_none()
+    if venue is None:
+        abort(404)
+
+    shows = db.session.query(
+            Show.start_time,
+            Artist.id.label("artist_id"),
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link")
+        ).join(Artist, Show.artist_id == Artist.id)\
+        .filter(Show.venue_id == venue_id)\
+        .order_by(Show.start_time).all()
+
+    data = to_dict(venue)
+    # turn the list of Genre objects into a list of strings
+    data["genres"] = [genre.name for genre in venue.genre]
+    now = datetime.now()
+    data.update(split_shows(shows, now))
+    # the next upcoming show moves to the past shows when it starts
+    cache_until(next((show.start_time for show in shows
+                      if show.start_time > now), None))
+
+    return render_template('pages/show_venue.html', venue=data)
+
+
+# ----------------------------------------------------------------
+# Create Venue
+# ----------------------------------------------------------------
+
+# forms (WTForms, Flask-WTF) are imported by the views rendering them, so
+# that starting a worker doesn't pay for them
+
+@venues.route('/create', methods=['GET'])
+def create_form():
+    from forms import VenueForm
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@venues.route('/create', methods=['POST'])
+def create_submission():
+    # DONE: insert form data as a new Venue record in the db, instead
+    # DONE: modify data to be the data object returned from db insertion
+    from forms import VenueForm
+
+    form = VenueForm(request.form, meta={"csrf": False})
+
+    # Enforce form fields validation, rejecting malformed data
+    if not form.validate():
+        for k, v in form.errors.items():
+            flash(f"Venue not saved: {v[0]}")
+        return redirect(url_for('.create_submission'))
+    else:
+        error = False
+        # the form returns a list of genres names (strings) whereas the
+        # genres m2m relationship requires a list of Genre objects.
+        # Turn the list of Genre names into a list of Genre objects
+        genres, unknown = resolve_genres(form.genres.data)
+        if unknown:
+            flash(f"Venue not saved: unknown genre {', '.join(unknown)}")
+            return redirect(url_for('.create_submission'))
+        if current_app.config["WRITE_BEHIND"]:
+            return accepted("venues", f"Venue {form.name.data.strip()}")
+
+        venue = Venue(
+            name=form.name.data.strip(),
+            city=form.city.data.strip(),
+            state=form.state.data,
+            address=form.address.data.strip(),
+            # strip non-digits
+            phone=re.sub("\D", "", form.phone.data.strip()),
+            genre=genres,
+            seeking_talent=True if form.seeking_talent.data == "Yes" else False,
+            seeking_description=form.seeking_description.data.strip(),
+            image_link=form.image_link.data.strip(),
+            website=form.website.data.strip(),
+            facebook_link=form.facebook_link.data.strip(),
+        )
+
+        try:
+            db.session.add(venue)
+            db.session.commit()
+            flash(f"Venue {venue.name} was successfully listed!")
+        except Exception as e:
+            print(sys.exc_info())
+            print(e)
+            error = True
+            db.session.rollback()
+        finally:
+            db.session.close()
+
+        if error:
+            # DONE: on unsuccessful db insert, flash an error instead.
+            flash(f"Venue {venue.name} could not be listed.")
+            abort(500)
+
+    return redirect(url_for('index'))
+
+
+@venues.route('/<int:venue_id>', methods=['POST'])
+def delete(venue_id):
+    # DONE: Complete this endpoint for taking a venue_id, and using
+    # SQLAlchemy ORM to delete a record. Handle cases where the session
+    # commit could fail.
+
+    # make sure the venue exists
+    # venue = Venue.query.get(venue_id)
+    venue = Venue.query.filter_by(id=venue_id).first_or_404()
+    if not venue:
+        # the call was somehow faked
+        flash("The requested venue doesn't exist.")
+        return redirect(url_for(".listing"))
+    else:
+        error = False
+        venue_name = venue.name  # store for the final flash
+        try:
+            db.session.delete(venue)
+            db.session.commit()
+        except Exception as e:
+            print(sys.exc_info())
+            print(e)
+            error = True
+            db.session.rollback()
+        finally:
+            db.session.close()
+
+        if error:
+            flash(f"An error occurred while deleting {venue_name}.")
+            print(f"An error occurred while deleting {venue_name}.")
+            abort(500)
+        else:
+            flash(f"successfully deleted venue {venue_name}!")
+            return redirect(url_for(".listing"))
+
+    # BONUS CHALLENGE: DONE Implement a button to delete a Venue on a Venue Page,
+    # have it so that clicking that button delete it from the db then redirect
+    # the user to the homepage
+    # return None
+
+
+#  ----------------------------------------------------------------
+#  Update
+#  ----------------------------------------------------------------
+
+@venues.route('/<int:venue_id>/edit', methods=['GET'])
+def edit(venue_id):
+    from forms import VenueForm
+    form = VenueForm()
+    # DONE: populate form with values from venue with ID <venue_id>
+    venue = Venue.query.get(venue_id)
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@venues.route('/<int:venue_id>/edit', methods=['POST'])
+def edit_submission(venue_id):
+    # DONE: take values from the form submitted, and update existing
+    # venue record with ID <venue_id> using the new attributes
+    from forms import VenueForm
+
+    venue = Venue.query.get(venue_id)
+    form = VenueForm(request.form, meta={"csrf": False})
+
+    # Enforce form fields validation, rejecting malformed data
+    if not form.validate():
+        for k, v in form.errors.items():
+            flash(f"Venue not saved: {v[0]}")
+        return redirect(url_for('.edit_submission', venue_id=venue_id))
+    else:
+        error = False
+        # the form returns a list of genres names (strings) whereas the
+        # genres m2m relationship requires a list of Genre objects.
+        # Turn the list of Genre names into a list of Genre objects
+        genres, unknown = resolve_genres(form.genres.data)
+        if unknown:
+            flash(f"Venue not saved: unknown genre {', '.join(unknown)}")
+            return redirect(url_for('.edit_submission', venue_id=venue_id))
+
+        venue.name = form.name.data.strip()
+        venue.city = form.city.data.strip()
+        venue.state = form.state.data
+        # strip non-digits
+        venue.phone = re.sub("\D", "", form.phone.data.strip())
+        venue.genre = genres
+        venue.address = form.address.data.strip()
+        venue.seeking_talent = True if form.seeking_talent.data == "Yes" else False
+        venue.seeking_description = form.seeking_description.data.strip()
+        venue.image_link = form.image_link.data.strip()
+        venue.website = form.website.data.strip()
+        venue.facebook_link = form.facebook_link.data.strip()
+
+        try:
+            db.session.add(venue)
+            db.session.commit()
+            flash(f"Venue {venue.name} was successfully listed!")
+        except Exception as e:
+            print(sys.exc_info())
+            print(e)
+            error = True
+            db.session.rollback()
+        finally:
+            db.session.close()
+
+        if error:
+            # DONE: on unsuccessful db insert, flash an error instead.
+            flash(f"Venue {venue.name} could not be listed.")
+            abort(500)
+
+    return redirect(url_for('.show', venue_id=venue_id))